@@ -1,4 +1,6 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
+from app.core.responses import json_bytes_response, render_json
 
 
 router = APIRouter()
@@ -6,4 +8,42 @@ router = APIRouter()
 
 @router.get("/", include_in_schema=False)
 def root():
-    return "TransTRACK Predictive Emission Forecasting & Anomaly Detection API"
\ No newline at end of file
+    return "TransTRACK Predictive Emission Forecasting & Anomaly Detection API"
+
+
+def get_openapi_body(app) -> bytes:
+    """OpenAPI schema yang di-render sekali ke JSON bytes (disimpan di app.state)"""
+    body = getattr(app.state, "openapi_body", None)
+    if body is None:
+        body = app.state.openapi_body = render_json(app.openapi())
+    return body
+
+
+def _openapi_url(request: Request) -> str:
+    """URL schema relatif terhadap root_path (mis. app di belakang proxy dengan prefix path)"""
+    return request.scope.get("root_path", "").rstrip("/") + "/openapi.json"
+
+
+# Pengganti handler bawaan FastAPI (openapi_url=None) yang me-render ulang schema setiap request
+@router.get("/openapi.json", include_in_schema=False)
+async def openapi_json(request: Request):
+    app = request.app
+    # Sama dengan handler bawaan: root_path dicantumkan di "servers" agar "Try it out" memakai prefix
+    root_path = request.scope.get("root_path", "").rstrip("/")
+    if root_path and app.root_path_in_servers:
+        server_urls = {server.get("url") for server in app.servers or []}
+        if root_path not in server_urls:
+            app.servers.insert(0, {"url": root_path})
+            app.openapi_schema = None
+            app.state.openapi_body = None
+    return json_bytes_response(get_openapi_body(app))
+
+
+@router.get("/docs", include_in_schema=False)
+async def swagger_ui_html(request: Request):
+    return get_swagger_ui_html(openapi_url=_openapi_url(request), title=f"{request.app.title} - Swagger UI")
+
+
+@router.get("/redoc", include_in_schema=False)
+async def redoc_html(request: Request):
+    return get_redoc_html(openapi_url=_openapi_url(request), title=f"{request.app.title} - ReDoc")
@@ -1,4 +1,7 @@
-from fastapi import APIRouter, HTTPException
+from functools import lru_cache
+from fastapi import APIRouter, HTTPException, status
+from app.core.batching import QueueFullError
+from app.core.responses import json_bytes_response, model_response, render_json
 from app.schemas.anomaly import (
     AnomalyDetectionInput,
     AnomalyDetectionOutput,
@@ -6,13 +9,17 @@ from app.schemas.anomaly import (
     FuelTheftDetectionOutput,
     ExcessiveIdleDetectionInput,
     ExcessiveIdleDetectionOutput,
+    ExcessiveIdleBatchInput,
+    ExcessiveIdleBatchOutput,
     EmissionInefficientDetectionInput,
     EmissionInefficientDetectionOutput
 )
+from app.services.anomaly_queue import anomaly_queue_enabled, enqueue_anomaly
 from app.services.anomaly_service import (
-    predict_anomaly,
+    anomaly_batcher,
     detect_fuel_theft,
     detect_excessive_idle,
+    detect_excessive_idle_batch,
     detect_emission_inefficiency,
     get_anomaly_model_info
 )
@@ -21,7 +28,11 @@ from app.services.anomaly_service import (
 router = APIRouter()
 
 
-@router.post("/detect", response_model=AnomalyDetectionOutput)
+@router.post(
+    "/detect",
+    response_model=None,
+    responses={200: {"model": AnomalyDetectionOutput}},
+)
 async def detect_anomaly(data: AnomalyDetectionInput):
     """
     Real-time anomaly detection menggunakan kombinasi rule-based dan ML approaches.
@@ -68,8 +79,21 @@ async def detect_anomaly(data: AnomalyDetectionInput):
     ```
     """
     try:
-        result = predict_anomaly(data)
-        return result
+        # Dengan ANOMALY_QUEUE_ENABLED, inference dijalankan worker terpisah lewat Redis stream
+        if anomaly_queue_enabled():
+            return model_response(await enqueue_anomaly(data))
+        result = await anomaly_batcher.process(data)
+        return model_response(result)
+    except QueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Server sedang sibuk, coba lagi beberapa saat"
+        )
+    except TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Anomaly worker tidak merespons, coba lagi beberapa saat"
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -134,6 +158,33 @@ async def detect_excessive_idle_endpoint(data: ExcessiveIdleDetectionInput):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post(
+    "/detect-excessive-idle/batch",
+    response_model=None,
+    responses={200: {"model": ExcessiveIdleBatchOutput}},
+)
+async def detect_excessive_idle_batch_endpoint(data: ExcessiveIdleBatchInput):
+    """
+    Deteksi excessive idle time untuk banyak device sekaligus (mis. laporan harian armada).
+    
+    Kriteria sama dengan /detect-excessive-idle; `results` berurutan sesuai `items`.
+    
+    ### Example Request:
+    ```json
+    {
+        "items": [
+            {"idle_duration_daily": 180, "device_id": "device_123"},
+            {"idle_duration_daily": 45, "device_id": "device_456"}
+        ]
+    }
+    ```
+    """
+    try:
+        return model_response(detect_excessive_idle_batch(data.items))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/detect-emission-inefficiency", response_model=EmissionInefficientDetectionOutput)
 async def detect_emission_inefficiency_endpoint(data: EmissionInefficientDetectionInput):
     """
@@ -170,16 +221,21 @@ async def detect_emission_inefficiency_endpoint(data: EmissionInefficientDetecti
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@lru_cache(maxsize=1)
+def _model_info_body() -> bytes:
+    """Body /model-info statis, di-render sekali (reset via _model_info_body.cache_clear() saat model di-reload)"""
+    return render_json({
+        "status": "success",
+        "model_info": get_anomaly_model_info()
+    })
+
+
 @router.get("/model-info")
 async def get_anomaly_model_info_endpoint():
     """
     Get informasi tentang model anomaly detection yang sedang digunakan.
     """
     try:
-        info = get_anomaly_model_info()
-        return {
-            "status": "success",
-            "model_info": info
-        }
+        return json_bytes_response(_model_info_body())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,14 +1,76 @@
+import asyncio
+import hashlib
+import time
+from functools import lru_cache
 from typing import Any
 from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from app.core.config import TRANSTRACK_FETCH_CONCURRENCY
+from app.core.executors import run_in_executor
+from app.core.responses import etag_matches
+from app.schemas.dashboard import BatchMetricsRequest
 from app.services.transtrack_service import get_history, process_history_data
-from app.services.dashboard_service import calculate_dashboard_metrics, generate_dashboard_summary
+from app.services.dashboard_service import IDLE_STATUSES, calculate_dashboard_metrics, generate_dashboard_summary
 
 router = APIRouter()
 
 
+@lru_cache(maxsize=4)
+def _utc_date_time(ts_sec: int) -> tuple[str, str]:
+    """Format (YYYY-MM-DD, HH:MM:SS) UTC, di-cache per detik"""
+    dt = datetime.fromtimestamp(ts_sec, timezone.utc)
+    return dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M:%S")
+
+
+def _build_dashboard_summary(full_history: dict[str, Any], device_id: int, date_range: str) -> dict[str, Any]:
+    """Tahap CPU dashboard: process history -> metrics -> summary (dijalankan di executor)"""
+    # Satu waktu referensi untuk filter hari ini, idle yang masih berjalan dan timestamp summary
+    now = datetime.now(timezone.utc)
+
+    # Process history untuk dapatkan fields yang diperlukan
+    history_data = process_history_data(full_history)
+
+    # Calculate metrics
+    metrics = calculate_dashboard_metrics(history_data, now=now)
+
+    # Generate summary dengan recommendations
+    return generate_dashboard_summary(device_id, metrics, date_range, now=now)
+
+
+def _history_etag(full_history: dict[str, Any], device_id: int, date: str) -> str:
+    """
+    ETag murah untuk history: device, tanggal, jumlah record, record & status terakhir.
+
+    Tidak berubah selama Transtrack tidak mengirim record baru untuk window yang sama, kecuali
+    kendaraan sedang idle: periode idle yang belum ditutup dihitung sampai waktu sekarang
+    (calculate_dashboard_metrics), sehingga idle time dan status_color terus bertambah dan
+    ETag ikut berganti setiap menit.
+    """
+    count = 0
+    last_item = None
+    last_status = None
+    items = full_history.get("items", []) if isinstance(full_history, dict) else []
+    for group in items:
+        group_items = group.get("items", []) if isinstance(group, dict) else []
+        if group_items:
+            count += len(group_items)
+            last_item = group_items[-1]
+            last_status = group.get("status")
+
+    last_id = None
+    if isinstance(last_item, dict):
+        last_id = last_item.get("id") or last_item.get("time")
+
+    key = f"{device_id}:{date}:{count}:{last_id}:{last_status}"
+    if last_status in IDLE_STATUSES:
+        key += f":{int(time.time() // 60)}"
+    return '"' + hashlib.blake2b(key.encode(), digest_size=8).hexdigest() + '"'
+
+
 @router.get("/metrics")
 async def dashboard_metrics(
+    request: Request,
+    response: Response,
     lang: str = Query("en", description="Language, e.g. 'en'"),
     user_api_hash: str = Query(..., description="user_api_hash token from login"),
     device_id: int = Query(..., description="Device ID from devices list"),
@@ -32,12 +94,13 @@ async def dashboard_metrics(
 
     Returns:
     - Dashboard metrics dengan emissions, intensity, idle time, status, dan recommendations
+
+    Mendukung conditional request: jika If-None-Match sama dengan ETag history terakhir
+    (tidak ada record baru), response 304 tanpa menghitung ulang metrics.
     """
     # Get current date (UTC for consistency between dev and prod)
-    now = datetime.now(timezone.utc)
-    today = now.strftime("%Y-%m-%d")
+    today, end_time = _utc_date_time(int(time.time()))
     start_time = "00:00:00"
-    end_time = now.strftime("%H:%M:%S")
 
     # Fetch history data dari transtrack untuk hari ini
     full_history = await get_history(
@@ -51,13 +114,71 @@ async def dashboard_metrics(
         snap_to_road=snap_to_road,
     )
 
-    # Process history untuk dapatkan fields yang diperlukan
-    history_data = process_history_data(full_history)
+    etag = _history_etag(full_history, device_id, today)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, max-age=5"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    response.headers.update(cache_headers)
 
-    # Calculate metrics
-    metrics = calculate_dashboard_metrics(history_data)
+    date_range = f"Today ({today}) up to {end_time}"
+    return await run_in_executor(_build_dashboard_summary, full_history, device_id, date_range)
 
-    # Generate summary dengan recommendations
+
+@router.post("/metrics/batch")
+async def dashboard_metrics_batch(
+    request: BatchMetricsRequest,
+    lang: str = Query("en", description="Language, e.g. 'en'"),
+    user_api_hash: str = Query(..., description="user_api_hash token from login"),
+    snap_to_road: bool = Query(False, description="Snap route to road (smoothing)"),
+) -> dict[str, Any]:
+    """
+    Dashboard metrics untuk beberapa kendaraan sekaligus.
+
+    History semua device di-fetch secara paralel dari Transtrack (maksimal
+    TRANSTRACK_FETCH_CONCURRENCY sekaligus agar tidak di-throttle upstream), lalu perhitungan
+    metrics tiap device dijalankan di executor sehingga tumpang tindih dengan I/O.
+    Kegagalan satu device tidak menggagalkan device lain.
+
+    Body:
+    - devices: list device ID (1-50)
+
+    Query params sama seperti /metrics (tanpa device_id).
+
+    Returns:
+    - results: list dashboard summary (format sama dengan /metrics) atau
+      {"device_id", "error", "status_code"} untuk device yang gagal
+    """
+    today, end_time = _utc_date_time(int(time.time()))
+    start_time = "00:00:00"
     date_range = f"Today ({today}) up to {end_time}"
-    summary = generate_dashboard_summary(device_id, metrics, date_range)
-    return summary
+    fetch_limit = asyncio.Semaphore(TRANSTRACK_FETCH_CONCURRENCY)
+
+    async def _device_metrics(device_id: int) -> dict[str, Any]:
+        async with fetch_limit:
+            full_history = await get_history(
+                lang=lang,
+                user_api_hash=user_api_hash,
+                device_id=device_id,
+                from_date=today,
+                from_time=start_time,
+                to_date=today,
+                to_time=end_time,
+                snap_to_road=snap_to_road,
+            )
+        return await run_in_executor(_build_dashboard_summary, full_history, device_id, date_range)
+
+    results = await asyncio.gather(
+        *[_device_metrics(device_id) for device_id in request.devices],
+        return_exceptions=True,
+    )
+
+    items = []
+    for device_id, result in zip(request.devices, results):
+        if isinstance(result, HTTPException):
+            items.append({"device_id": device_id, "error": result.detail, "status_code": result.status_code})
+        elif isinstance(result, Exception):
+            items.append({"device_id": device_id, "error": str(result), "status_code": 500})
+        else:
+            items.append(result)
+
+    return {"total_devices": len(request.devices), "results": items}
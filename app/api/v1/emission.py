@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException
+from functools import lru_cache
+from fastapi import APIRouter, HTTPException, status
+from app.core.batching import QueueFullError
+from app.core.responses import json_bytes_response, model_response, render_json
 from app.schemas.emission import (
     EmissionRequest, 
     EmissionResponse, 
     EmissionPredictionInput, 
     EmissionPredictionOutput
 )
-from app.services.emission_service import predict_emission, get_model_info
+from app.services.emission_service import emission_batcher, get_model_info
 
 
 router = APIRouter()
@@ -17,7 +20,11 @@ router = APIRouter()
 #     return ()
 
 
-@router.post("/predict-hourly", response_model=EmissionPredictionOutput)
+@router.post(
+    "/predict-hourly",
+    response_model=None,
+    responses={200: {"model": EmissionPredictionOutput}},
+)
 async def predict_hourly_emission(data: EmissionPredictionInput):
     """
     Prediksi emisi CO2 berdasarkan aggregated hourly features.
@@ -58,22 +65,32 @@ async def predict_hourly_emission(data: EmissionPredictionInput):
     ```
     """
     try:
-        result = predict_emission(data)
-        return result
+        result = await emission_batcher.process(data)
+        return model_response(result)
+    except QueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Server sedang sibuk, coba lagi beberapa saat"
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@lru_cache(maxsize=1)
+def _model_info_body() -> bytes:
+    """Body /model-info statis, di-render sekali (reset via _model_info_body.cache_clear() saat model di-reload)"""
+    return render_json({
+        "status": "success",
+        "model_info": get_model_info()
+    })
+
+
 @router.get("/model-info")
 async def get_emission_model_info():
     """
     Get informasi tentang model emission prediction yang sedang digunakan.
     """
     try:
-        info = get_model_info()
-        return {
-            "status": "success",
-            "model_info": info
-        }
+        return json_bytes_response(_model_info_body())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
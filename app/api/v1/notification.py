@@ -1,4 +1,7 @@
-from fastapi import APIRouter, HTTPException, Query
+from functools import lru_cache
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.core.responses import json_bytes_response, model_response, render_json
 from app.schemas.notification import (
     DashboardNotificationInput,
     DashboardNotificationOutput,
@@ -13,6 +16,7 @@ from app.services.notification_service import (
     generate_dashboard_notifications,
     generate_anomaly_notifications,
     get_notification_history,
+    iter_notification_history,
     mark_notifications_as_read
 )
 
@@ -20,7 +24,11 @@ from app.services.notification_service import (
 router = APIRouter()
 
 
-@router.post("/dashboard", response_model=DashboardNotificationOutput)
+@router.post(
+    "/dashboard",
+    response_model=None,
+    responses={200: {"model": DashboardNotificationOutput}},
+)
 async def generate_dashboard_notification(data: DashboardNotificationInput):
     """
     Generate notifikasi berdasarkan dashboard metrics.
@@ -69,12 +77,16 @@ async def generate_dashboard_notification(data: DashboardNotificationInput):
     """
     try:
         result = generate_dashboard_notifications(data)
-        return result
+        return model_response(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/anomaly", response_model=AnomalyNotificationOutput)
+@router.post(
+    "/anomaly",
+    response_model=None,
+    responses={200: {"model": AnomalyNotificationOutput}},
+)
 async def generate_anomaly_notification(data: AnomalyNotificationInput):
     """
     Generate notifikasi dari anomaly detection result.
@@ -120,13 +132,20 @@ async def generate_anomaly_notification(data: AnomalyNotificationInput):
     """
     try:
         result = generate_anomaly_notifications(data)
-        return result
+        return model_response(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _encode_ndjson(notifications):
+    """Encode tiap notifikasi sebagai satu baris JSON"""
+    for n in notifications:
+        yield render_json(n) + b"\n"
+
+
 @router.get("/history/{device_id}")
 async def get_notification_history_endpoint(
+    request: Request,
     device_id: int,
     limit: int = Query(50, description="Limit jumlah notifikasi", ge=1, le=1000),
     days: int = Query(7, description="Jumlah hari history", ge=1, le=90),
@@ -143,27 +162,25 @@ async def get_notification_history_endpoint(
     - **notification_type**: Filter by type (EMISSION_ALERT, FUEL_THEFT_ALERT, dll)
     - **priority**: Filter by priority (CRITICAL, HIGH, MEDIUM, LOW)
     
+    Dengan header `Accept: application/x-ndjson` response di-stream, satu notifikasi per baris.
+    
     ### Example:
     ```
     GET /api/v1/notification/history/123?limit=20&days=7&priority=HIGH
     ```
     """
     try:
-        history = get_notification_history(device_id, limit=limit, days=days)
-        
-        # Apply filters if specified
-        notifications = history['notifications']
-        
-        if notification_type:
-            notifications = [n for n in notifications if n['notification_type'] == notification_type]
-        
-        if priority:
-            notifications = [n for n in notifications if n['priority'] == priority]
+        if "application/x-ndjson" in request.headers.get("accept", ""):
+            notifications = iter_notification_history(
+                device_id, limit=limit, days=days,
+                notification_type=notification_type, priority=priority
+            )
+            return StreamingResponse(_encode_ndjson(notifications), media_type="application/x-ndjson")
         
-        history['notifications'] = notifications
-        history['total_records'] = len(notifications)
-        
-        return history
+        return get_notification_history(
+            device_id, limit=limit, days=days,
+            notification_type=notification_type, priority=priority
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -196,6 +213,26 @@ async def mark_as_read_endpoint(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@lru_cache(maxsize=1)
+def _thresholds_body() -> bytes:
+    """Body /thresholds statis, di-render sekali"""
+    from app.services.notification_service import NOTIFICATION_THRESHOLDS
+    
+    return render_json({
+        "status": "success",
+        "thresholds": NOTIFICATION_THRESHOLDS,
+        "description": {
+            "emission_intensity_critical": "gCO2/km - Alert CRITICAL",
+            "emission_intensity_high": "gCO2/km - Alert HIGH",
+            "emission_intensity_medium": "gCO2/km - Alert MEDIUM",
+            "idle_time_critical": "hours - Alert CRITICAL",
+            "idle_time_warning": "hours - Alert MEDIUM",
+            "fuel_consumption_high": "liters - Alert HIGH",
+            "fuel_consumption_medium": "liters - Monitor"
+        }
+    })
+
+
 @router.get("/thresholds")
 async def get_notification_thresholds():
     """
@@ -207,20 +244,6 @@ async def get_notification_thresholds():
     - Fuel Consumption (high, medium)
     """
     try:
-        from app.services.notification_service import NOTIFICATION_THRESHOLDS
-        
-        return {
-            "status": "success",
-            "thresholds": NOTIFICATION_THRESHOLDS,
-            "description": {
-                "emission_intensity_critical": "gCO2/km - Alert CRITICAL",
-                "emission_intensity_high": "gCO2/km - Alert HIGH",
-                "emission_intensity_medium": "gCO2/km - Alert MEDIUM",
-                "idle_time_critical": "hours - Alert CRITICAL",
-                "idle_time_warning": "hours - Alert MEDIUM",
-                "fuel_consumption_high": "liters - Alert HIGH",
-                "fuel_consumption_medium": "liters - Monitor"
-            }
-        }
+        return json_bytes_response(_thresholds_body())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1 import authentication, emission, anomaly, transtrack, dashboard, notification, authentication
+from app.api.v1 import authentication, emission, anomaly, transtrack, dashboard, notification
 
 
 api_router = APIRouter()
@@ -1,38 +1,100 @@
-from typing import Any
-from fastapi import APIRouter, Query
-from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from app.core.cache import cache_get, cache_set
+from app.core.config import TRANSTRACK_CACHE_TTL_DEVICES
+from app.core.redis import redis_enabled
+from app.core.responses import etag_json_response, render_json
+from app.schemas.transtrack import AddressBatchRequest, DeviceSummary, ProcessedHistoryItem
 from app.services.transtrack_service import (
+    devices_cache_key,
     get_devices,
     get_history,
+    get_processed_history,
+    history_cache_key,
+    history_cache_ttl,
     simplify_devices,
-    process_history_data,
     get_address,
-    devices_to_csv,
-    history_to_csv,
+    get_addresses_batch,
+    devices_to_csv_iter,
+    history_to_csv_iter,
 )
 
 router = APIRouter()
 
+# Format tanggal/waktu divalidasi di query param: input salah langsung 422 tanpa request ke Transtrack
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+TIME_PATTERN = r"^\d{2}:\d{2}:\d{2}$"
 
-@router.get("/devices")
+# Endpoint dengan payload besar (device list, history ribuan titik) mengembalikan bytes orjson
+# langsung: response_model=None + dict biasa akan melewati jsonable_encoder yang ~40x lebih lambat.
+# Response diberi ETag dari body; If-None-Match yang cocok dijawab 304 tanpa body.
+
+
+async def _tee_to_cache(chunks: Iterator[str], key: str, ttl: int) -> AsyncIterator[str]:
+    """
+    Stream chunk ke client sambil mengumpulkan CSV lengkap untuk di-cache setelah selesai.
+
+    Generator CSV sync dijalankan di threadpool (seperti StreamingResponse untuk iterator sync)
+    supaya serialisasi history besar tidak memblokir event loop.
+    """
+    parts = []
+    async for chunk in iterate_in_threadpool(chunks):
+        parts.append(chunk)
+        yield chunk
+    await cache_set(key, "".join(parts).encode(), ttl)
+
+
+async def _stream_csv(
+    key: str,
+    ttl: int,
+    build_rows: Callable[[], Awaitable[list[dict]]],
+    to_csv_iter: Callable[[list[dict]], Iterator[str]],
+    filename: str,
+) -> StreamingResponse:
+    """
+    StreamingResponse CSV yang di-encode per chunk (tidak dibangun sebagai satu string).
+
+    CSV yang sudah di-serialize di-cache di Redis (tt:csv:<key>) sehingga download ulang
+    melewati fetch dan processing.
+    """
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    cache_key = "tt:csv:" + key
+    csv_content = await cache_get(cache_key)
+    if csv_content is not None:
+        return StreamingResponse(iter([csv_content]), media_type="text/csv", headers=headers)
+
+    chunks = to_csv_iter(await build_rows())
+    if redis_enabled():
+        chunks = _tee_to_cache(chunks, cache_key, ttl)
+    return StreamingResponse(chunks, media_type="text/csv", headers=headers)
+
+
+@router.get("/devices", response_model=None)
 async def devices(
+    request: Request,
     lang: str = Query("en", description="Language, e.g. 'en'"),
     user_api_hash: str = Query(..., description="user_api_hash token from login")
-) -> Any:
+) -> Response:
     """Return list of devices from Transtrack API.
 
     Query params:
     - lang: language code (default 'en')
     - user_api_hash: token obtained from login
     """
-    return await get_devices(lang=lang, user_api_hash=user_api_hash)
+    full_devices = await get_devices(lang=lang, user_api_hash=user_api_hash)
+    return etag_json_response(render_json(full_devices), request.headers.get("if-none-match"))
 
 
-@router.get("/devices-summary")
+@router.get(
+    "/devices-summary", response_model=None, responses={200: {"model": list[DeviceSummary]}}
+)
 async def devices_summary(
+    request: Request,
     lang: str = Query("en", description="Language, e.g. 'en'"),
     user_api_hash: str = Query(..., description="user_api_hash token from login")
-) -> list[dict]:
+) -> Response:
     """Return simplified list of devices (id and name only) from Transtrack API.
 
     Query params:
@@ -43,20 +105,22 @@ async def devices_summary(
     - List of devices with only {id, name} fields
     """
     full_devices = await get_devices(lang=lang, user_api_hash=user_api_hash)
-    return simplify_devices(full_devices)
+    body = render_json(simplify_devices(full_devices))
+    return etag_json_response(body, request.headers.get("if-none-match"))
 
 
-@router.get("/history")
+@router.get("/history", response_model=None)
 async def history(
+    request: Request,
     lang: str = Query("en", description="Language, e.g. 'en'"),
     user_api_hash: str = Query(..., description="user_api_hash token from login"),
     device_id: int = Query(..., description="Device ID from devices list"),
     snap_to_road: bool = Query(False, description="Snap route to road (smoothing)"),
-    from_date: str | None = Query(None, description="Start date (YYYY-MM-DD)"),
-    from_time: str | None = Query(None, description="Start time (HH:MM:SS)"),
-    to_date: str | None = Query(None, description="End date (YYYY-MM-DD)"),
-    to_time: str | None = Query(None, description="End time (HH:MM:SS)"),
-) -> Any:
+    from_date: str | None = Query(None, description="Start date (YYYY-MM-DD)", pattern=DATE_PATTERN),
+    from_time: str | None = Query(None, description="Start time (HH:MM:SS)", pattern=TIME_PATTERN),
+    to_date: str | None = Query(None, description="End date (YYYY-MM-DD)", pattern=DATE_PATTERN),
+    to_time: str | None = Query(None, description="End time (HH:MM:SS)", pattern=TIME_PATTERN),
+) -> Response:
     """Return history perjalanan kendaraan from Transtrack API.
 
     Query params:
@@ -66,7 +130,7 @@ async def history(
     - snap_to_road: boolean flag to smooth route
     - from_date/from_time, to_date/to_time: date/time range
     """
-    return await get_history(
+    full_history = await get_history(
         lang=lang,
         user_api_hash=user_api_hash,
         device_id=device_id,
@@ -76,19 +140,23 @@ async def history(
         to_time=to_time,
         snap_to_road=snap_to_road,
     )
+    return etag_json_response(render_json(full_history), request.headers.get("if-none-match"))
 
 
-@router.get("/history-processed")
+@router.get(
+    "/history-processed", response_model=None, responses={200: {"model": list[ProcessedHistoryItem]}}
+)
 async def history_processed(
+    request: Request,
     lang: str = Query("en", description="Language, e.g. 'en'"),
     user_api_hash: str = Query(..., description="user_api_hash token from login"),
     device_id: int = Query(..., description="Device ID from devices list"),
     snap_to_road: bool = Query(False, description="Snap route to road (smoothing)"),
-    from_date: str | None = Query(None, description="Start date (YYYY-MM-DD)"),
-    from_time: str | None = Query(None, description="Start time (HH:MM:SS)"),
-    to_date: str | None = Query(None, description="End date (YYYY-MM-DD)"),
-    to_time: str | None = Query(None, description="End time (HH:MM:SS)"),
-) -> list[dict]:
+    from_date: str | None = Query(None, description="Start date (YYYY-MM-DD)", pattern=DATE_PATTERN),
+    from_time: str | None = Query(None, description="Start time (HH:MM:SS)", pattern=TIME_PATTERN),
+    to_date: str | None = Query(None, description="End date (YYYY-MM-DD)", pattern=DATE_PATTERN),
+    to_time: str | None = Query(None, description="End time (HH:MM:SS)", pattern=TIME_PATTERN),
+) -> Response:
     """Return processed history dengan 17 field yang diakumulasikan dari sensor data.
 
     Mengekstrak: timestamp, device_id, latitude, longitude, speed, ignition, motion,
@@ -101,7 +169,7 @@ async def history_processed(
       motion, odometer_km, engine_hours, fuel_level_l, rpm, battery_voltage, sat, hdop, pdop,
       valid, status
     """
-    full_history = await get_history(
+    history_data = await get_processed_history(
         lang=lang,
         user_api_hash=user_api_hash,
         device_id=device_id,
@@ -111,7 +179,8 @@ async def history_processed(
         to_time=to_time,
         snap_to_road=snap_to_road,
     )
-    return process_history_data(full_history)
+    body = render_json(history_data)
+    return etag_json_response(body, request.headers.get("if-none-match"))
 
 
 @router.get("/address")
@@ -132,6 +201,35 @@ async def address(
     return await get_address(lat=lat, lon=lon)
 
 
+@router.post("/address/batch")
+async def address_batch(request: AddressBatchRequest) -> dict[str, Any]:
+    """Reverse geocoding untuk beberapa titik sekaligus (mis. anotasi titik history).
+
+    Titik dalam bucket ~11 m yang sama berbagi satu lookup; bucket yang sudah di-cache
+    diambil dengan satu MGET Redis. Kegagalan satu titik tidak menggagalkan titik lain.
+
+    Body:
+    - points: list {lat, lon} (1-100)
+
+    Returns:
+    - results: list alamat (format sama dengan /address) atau
+      {"lat", "lon", "error", "status_code"} untuk titik yang gagal
+    """
+    points = [(point.lat, point.lon) for point in request.points]
+    results = await get_addresses_batch(points)
+
+    items = []
+    for (lat, lon), result in zip(points, results):
+        if isinstance(result, HTTPException):
+            items.append({"lat": lat, "lon": lon, "error": result.detail, "status_code": result.status_code})
+        elif isinstance(result, Exception):
+            items.append({"lat": lat, "lon": lon, "error": str(result), "status_code": 500})
+        else:
+            items.append(result)
+
+    return {"total_points": len(points), "results": items}
+
+
 @router.get("/device-summary-csv")
 async def device_summary_csv(
     lang: str = Query("en", description="Language, e.g. 'en'"),
@@ -147,14 +245,16 @@ async def device_summary_csv(
     - CSV file dengan fields: id, name, online, time, speed, total_distance, lat, lng,
       altitude, plate_number, driver_name
     """
-    full_devices = await get_devices(lang=lang, user_api_hash=user_api_hash)
-    devices_data = simplify_devices(full_devices)
-    csv_content = devices_to_csv(devices_data)
+    async def build_rows() -> list[dict]:
+        full_devices = await get_devices(lang=lang, user_api_hash=user_api_hash)
+        return simplify_devices(full_devices)
 
-    return StreamingResponse(
-        iter([csv_content]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=devices.csv"},
+    return await _stream_csv(
+        devices_cache_key(lang, user_api_hash),
+        TRANSTRACK_CACHE_TTL_DEVICES,
+        build_rows,
+        devices_to_csv_iter,
+        "devices.csv",
     )
 
 
@@ -164,10 +264,10 @@ async def history_processed_csv(
     user_api_hash: str = Query(..., description="user_api_hash token from login"),
     device_id: int = Query(..., description="Device ID from devices list"),
     snap_to_road: bool = Query(False, description="Snap route to road (smoothing)"),
-    from_date: str | None = Query(None, description="Start date (YYYY-MM-DD)"),
-    from_time: str | None = Query(None, description="Start time (HH:MM:SS)"),
-    to_date: str | None = Query(None, description="End date (YYYY-MM-DD)"),
-    to_time: str | None = Query(None, description="End time (HH:MM:SS)"),
+    from_date: str | None = Query(None, description="Start date (YYYY-MM-DD)", pattern=DATE_PATTERN),
+    from_time: str | None = Query(None, description="Start time (HH:MM:SS)", pattern=TIME_PATTERN),
+    to_date: str | None = Query(None, description="End date (YYYY-MM-DD)", pattern=DATE_PATTERN),
+    to_time: str | None = Query(None, description="End time (HH:MM:SS)", pattern=TIME_PATTERN),
 ) -> StreamingResponse:
     """Download processed history data sebagai CSV file.
 
@@ -178,21 +278,21 @@ async def history_processed_csv(
       motion, odometer_km, engine_hours, fuel_level_l, rpm, battery_voltage, sat, hdop,
       pdop, valid, status
     """
-    full_history = await get_history(
-        lang=lang,
-        user_api_hash=user_api_hash,
-        device_id=device_id,
-        from_date=from_date,
-        from_time=from_time,
-        to_date=to_date,
-        to_time=to_time,
-        snap_to_road=snap_to_road,
-    )
-    history_data = process_history_data(full_history)
-    csv_content = history_to_csv(history_data)
+    async def build_rows() -> list[dict]:
+        return await get_processed_history(
+            lang=lang,
+            user_api_hash=user_api_hash,
+            device_id=device_id,
+            from_date=from_date,
+            from_time=from_time,
+            to_date=to_date,
+            to_time=to_time,
+            snap_to_road=snap_to_road,
+        )
 
-    return StreamingResponse(
-        iter([csv_content]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=history.csv"},
+    key = history_cache_key(
+        lang, user_api_hash, device_id, from_date, from_time, to_date, to_time, snap_to_road
+    )
+    return await _stream_csv(
+        key, history_cache_ttl(to_date), build_rows, history_to_csv_iter, "history.csv"
     )
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import queue
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    BATCH_MAX_SIZE,
+    BATCH_MAX_WAIT_MS,
+    BATCH_MAX_QUEUE_SIZE,
+    BATCH_MAX_CONCURRENCY,
+)
+from app.core.executors import run_in_executor
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Dilempar saat antrian batcher penuh (dipetakan ke HTTP 429 oleh endpoint)"""
+
+
+class AsyncBatcher(ABC):
+    """
+    Dynamic batcher untuk inference ML.
+
+    Request masuk ke asyncio.Queue; background task mengumpulkan item sampai
+    max_batch_size atau max_wait_ms tercapai, lalu memanggil process_batch() sekali
+    di executor dan meng-resolve Future masing-masing request.
+
+    Features setiap batch ditulis langsung ke buffer (max_batch_size, n_features)
+    yang dialokasikan sekali (satu buffer per batch yang boleh berjalan bersamaan),
+    sehingga hot path tidak membuat list/tuple/ndarray baru per request.
+
+    Subclass wajib mengisi n_features (dan opsional feature_dtype) dan mengimplementasikan:
+    - fill_row(row, item): tulis features satu item ke row buffer
+    - process_batch(items, features) -> list hasil dengan urutan sama seperti items
+    """
+
+    n_features: int = 0
+    feature_dtype = np.float32
+
+    def __init__(
+        self,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        max_queue_size: int = BATCH_MAX_QUEUE_SIZE,
+        max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.max_concurrency = max(1, max_concurrency)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+        # Buffer diambil/dikembalikan dari thread executor, jadi pakai queue thread-safe
+        self._buffers: queue.SimpleQueue = queue.SimpleQueue()
+        for _ in range(self.max_concurrency):
+            self._buffers.put(np.empty((max_batch_size, self.n_features), dtype=self.feature_dtype))
+
+    @abstractmethod
+    def fill_row(self, row: np.ndarray, item: Any) -> None:
+        """Tulis features satu item ke row buffer (in-place)"""
+
+    @abstractmethod
+    def process_batch(self, items: List[Any], features: np.ndarray) -> List[Any]:
+        """Proses satu batch secara sinkron (dijalankan di executor)"""
+
+    def _process(self, items: List[Any]) -> List[Any]:
+        buffer = self._buffers.get()
+        try:
+            for i, item in enumerate(items):
+                self.fill_row(buffer[i], item)
+            return self.process_batch(items, buffer[:len(items)])
+        finally:
+            self._buffers.put(buffer)
+
+    async def process(self, item: Any) -> Any:
+        """Masukkan item ke antrian dan tunggu hasilnya"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"{type(self).__name__} queue is full")
+        return await future
+
+    def _ensure_worker(self) -> None:
+        # Queue dan task terikat ke event loop; buat ulang jika loop berganti
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._worker = loop.create_task(self._run())
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            # Batasi jumlah batch yang diproses bersamaan
+            await self._semaphore.acquire()
+            task = self._loop.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            items = [item for item, _ in batch]
+            try:
+                results = await run_in_executor(self._process, items)
+            except Exception as exc:
+                logger.error(f"{type(self).__name__} batch of {len(items)} failed: {exc}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._semaphore.release()
@@ -0,0 +1,137 @@
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.core.redis import get_redis
+from app.core.responses import load_json, render_json
+
+logger = logging.getLogger(__name__)
+
+
+async def cache_get(key: str) -> Optional[bytes]:
+    """GET key dari Redis; None jika miss, Redis tidak dikonfigurasi, atau error"""
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        return await redis.get(key)
+    except Exception as e:
+        logger.warning(f"Redis GET {key} failed: {e}")
+        return None
+
+
+async def cache_set(key: str, value: bytes, ttl: int) -> None:
+    """SET key EX ttl; error Redis hanya di-log"""
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.set(key, value, ex=ttl)
+    except Exception as e:
+        logger.warning(f"Redis SET {key} failed: {e}")
+
+
+async def cache_get_many(keys: List[str]) -> List[Optional[bytes]]:
+    """MGET beberapa key dalam satu round-trip; semua None jika Redis tidak tersedia"""
+    redis = get_redis()
+    if redis is None or not keys:
+        return [None] * len(keys)
+    try:
+        return await redis.mget(keys)
+    except Exception as e:
+        logger.warning(f"Redis MGET of {len(keys)} keys failed: {e}")
+        return [None] * len(keys)
+
+
+async def cache_set_many(values: Dict[str, bytes], ttl: int) -> None:
+    """SET beberapa key (EX ttl) dalam satu pipeline; error Redis hanya di-log"""
+    redis = get_redis()
+    if redis is None or not values:
+        return
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.set(key, value, ex=ttl)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Redis pipeline SET of {len(values)} keys failed: {e}")
+
+
+async def cached(
+    key: str,
+    ttl: int,
+    factory: Callable[[], Awaitable[Any]],
+    dumps: Callable[[Any], bytes] = render_json,
+    loads: Callable[[bytes], Any] = load_json,
+) -> Any:
+    """
+    Read-through cache di Redis: GET key, jika miss jalankan factory lalu SET key EX ttl.
+
+    Nilai disimpan sebagai bytes (default JSON via orjson). Tanpa Redis, atau jika Redis
+    error, factory langsung dipanggil sehingga cache tidak pernah membuat request gagal.
+    Exception dari factory tidak di-cache.
+    """
+    if get_redis() is None:
+        return await factory()
+
+    raw = await cache_get(key)
+    if raw is not None:
+        return loads(raw)
+
+    value = await factory()
+    await cache_set(key, dumps(value), ttl)
+    return value
+
+
+class LRUCache:
+    """
+    LRU in-process kecil untuk objek Python yang sudah di-parse (tanpa round-trip Redis).
+
+    Hanya dipakai dari event loop (tidak thread-safe). Nilai dibagi antar caller,
+    jadi caller tidak boleh memodifikasinya. hits/misses dicatat untuk tuning maxsize.
+
+    Dengan maxweight > 0, total weigher(value) semua entry juga dibatasi (mis. jumlah record),
+    sehingga memori tetap terbatas walaupun ukuran tiap entry sangat bervariasi.
+    Entry yang sendirian sudah melebihi maxweight tidak di-cache.
+    """
+
+    def __init__(self, maxsize: int, maxweight: int = 0, weigher: Callable[[Any], int] = len):
+        self.maxsize = maxsize
+        self.maxweight = maxweight
+        self.weigher = weigher
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        try:
+            value, _ = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        weight = self.weigher(value) if self.maxweight > 0 else 0
+        if weight > self.maxweight > 0:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.weight -= old[1]
+        self._data[key] = (value, weight)
+        self.weight += weight
+        while len(self._data) > self.maxsize or (self.maxweight > 0 and self.weight > self.maxweight):
+            _, (_, evicted_weight) = self._data.popitem(last=False)
+            self.weight -= evicted_weight
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data), "maxsize": self.maxsize,
+            "weight": self.weight, "maxweight": self.maxweight,
+            "hits": self.hits, "misses": self.misses,
+        }
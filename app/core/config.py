@@ -0,0 +1,75 @@
+import os
+
+
+# Bagian core per proses: cpu_count dibagi rata dengan jumlah worker server (WEB_CONCURRENCY,
+# diisi gunicorn_config.py). Dipakai sebagai default semua pool thread CPU-bound di bawah agar
+# total thread inference di host ~cpu_count, bukan workers x cpu_count
+_CPU_SHARE = max(1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", 1)))
+
+# Jumlah worker thread untuk inference ML (CPU-bound) di luar event loop
+ML_EXECUTOR_WORKERS = int(os.getenv("ML_EXECUTOR_WORKERS", _CPU_SHARE))
+
+# Dynamic batching untuk endpoint inference (/anomaly/detect, /emission/predict-hourly)
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 32))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 20))
+BATCH_MAX_QUEUE_SIZE = int(os.getenv("BATCH_MAX_QUEUE_SIZE", 1024))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", ML_EXECUTOR_WORKERS))
+
+# onnxruntime intra-op threads per proses
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", _CPU_SHARE))
+
+# Fallback sklearn: score_samples Isolation Forest diparalelkan antar tree (thread, ORT_INTRA_OP_THREADS)
+# hanya untuk batch sebesar ini ke atas; batch kecil lebih cepat sekuensial
+IFOREST_PARALLEL_MIN_SAMPLES = int(os.getenv("IFOREST_PARALLEL_MIN_SAMPLES", 1000))
+
+# Connection pool shared httpx.AsyncClient untuk request ke Transtrack
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 200))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 100))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))
+# Idle keep-alive connection ditahan lebih lama dari default httpx (5 s) agar poll berikutnya reuse koneksi
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60))
+# Batas request paralel ke Transtrack per proses (budget concurrency provider); sisanya antre
+TRANSTRACK_MAX_CONCURRENCY = int(os.getenv("TRANSTRACK_MAX_CONCURRENCY", 32))
+
+# Cache reverse geocoding: koordinat dibulatkan ke N desimal (4 = ~11 m) sebagai key
+ADDRESS_CACHE_TTL = int(os.getenv("ADDRESS_CACHE_TTL", 30 * 24 * 60 * 60))
+ADDRESS_BUCKET_DECIMALS = int(os.getenv("ADDRESS_BUCKET_DECIMALS", 4))
+
+# Maksimum fetch Transtrack paralel per request fan-out (mis. /dashboard/metrics/batch)
+TRANSTRACK_FETCH_CONCURRENCY = int(os.getenv("TRANSTRACK_FETCH_CONCURRENCY", 16))
+
+# Kompresi gzip untuk response besar (history JSON / CSV)
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", 1024))
+GZIP_COMPRESS_LEVEL = int(os.getenv("GZIP_COMPRESS_LEVEL", 5))
+
+# Redis opsional (kosong = fitur berbasis Redis dinonaktifkan)
+REDIS_URL = os.getenv("REDIS_URL", "")
+
+# Redis stream queue untuk /anomaly/detect. Opt-in terpisah dari REDIS_URL (yang juga dipakai
+# cache): jika aktif, inference dijalankan worker `python -m app.services.anomaly_queue`
+ANOMALY_QUEUE_ENABLED = os.getenv("ANOMALY_QUEUE_ENABLED", "false").lower() == "true"
+ANOMALY_QUEUE_STREAM = os.getenv("ANOMALY_QUEUE_STREAM", "anomaly:in")
+ANOMALY_QUEUE_GROUP = os.getenv("ANOMALY_QUEUE_GROUP", "anomaly-workers")
+ANOMALY_QUEUE_MAX_LEN = int(os.getenv("ANOMALY_QUEUE_MAX_LEN", 5000))
+ANOMALY_QUEUE_RESULT_TIMEOUT = float(os.getenv("ANOMALY_QUEUE_RESULT_TIMEOUT", 10))
+# Entry pending lebih lama dari ini dianggap milik worker yang mati dan di-claim ulang (XAUTOCLAIM)
+ANOMALY_QUEUE_CLAIM_IDLE_MS = int(os.getenv("ANOMALY_QUEUE_CLAIM_IDLE_MS", 3000))
+
+# Opt-in: lewati Isolation Forest jika rule-based sudah memastikan severity CRITICAL (fuel theft).
+# Mengubah kontrak response untuk record tsb (tanpa ML_ANOMALY di anomaly_types, confidence berbeda)
+ANOMALY_SHORT_CIRCUIT = os.getenv("ANOMALY_SHORT_CIRCUIT", "false").lower() == "true"
+
+# Cache response Transtrack di Redis (detik); history yang sudah lewat (to_date < hari ini) immutable
+TRANSTRACK_CACHE_TTL_DEVICES = int(os.getenv("TRANSTRACK_CACHE_TTL_DEVICES", 30))
+TRANSTRACK_CACHE_TTL_LIVE = int(os.getenv("TRANSTRACK_CACHE_TTL_LIVE", 30))
+TRANSTRACK_CACHE_TTL_PAST = int(os.getenv("TRANSTRACK_CACHE_TTL_PAST", 24 * 60 * 60))
+# LRU in-process untuk hasil process_history_data range yang sudah lewat (per worker process).
+# Dibatasi jumlah entry dan total record (~1-2 KB per record), karena satu entry bisa berisi history sebulan
+TRANSTRACK_LOCAL_CACHE_SIZE = int(os.getenv("TRANSTRACK_LOCAL_CACHE_SIZE", 8))
+TRANSTRACK_LOCAL_CACHE_MAX_RECORDS = int(os.getenv("TRANSTRACK_LOCAL_CACHE_MAX_RECORDS", 20000))
+
+# Logging aplikasi (app.core.logging); LOG_FILE kosong = hanya console
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "")
+LOG_FILE_MAX_BYTES = int(os.getenv("LOG_FILE_MAX_BYTES", 10_000_000))
+LOG_FILE_BACKUP_COUNT = int(os.getenv("LOG_FILE_BACKUP_COUNT", 5))
@@ -0,0 +1,16 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.core.config import ML_EXECUTOR_WORKERS
+
+# Executor untuk inference ML (Isolation Forest / regressor) agar tidak memblokir event loop.
+# Thread pool dipakai (bukan process pool): traversal tree sklearn melepas GIL, model cukup
+# di-load sekali per proses, dan runtime serverless (Vercel) tidak mendukung multiprocessing.
+EXECUTOR = ThreadPoolExecutor(max_workers=ML_EXECUTOR_WORKERS, thread_name_prefix="ml-inference")
+
+
+async def run_in_executor(func: Callable[..., Any], *args: Any) -> Any:
+    """Jalankan fungsi CPU-bound di EXECUTOR dan tunggu hasilnya tanpa memblokir event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(EXECUTOR, func, *args)
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+from app.core.config import (
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_TIMEOUT,
+    TRANSTRACK_MAX_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 butuh package h2 (httpx[http2]); tanpa itu client tetap jalan dengan HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_upstream_limit: Optional[asyncio.Semaphore] = None
+_upstream_limit_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Shared httpx.AsyncClient untuk semua request keluar (Transtrack, geocoding).
+
+    Koneksi TCP/TLS di-reuse antar request sehingga tidak ada handshake per call.
+    Client dibuat ulang jika event loop berganti (mis. test client / cold start serverless).
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            http2=HAS_HTTP2,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=HTTP_TIMEOUT,
+        )
+        _client_loop = loop
+    return _client
+
+
+def get_upstream_limit() -> asyncio.Semaphore:
+    """
+    Semaphore app-wide untuk request keluar ke Transtrack (TRANSTRACK_MAX_CONCURRENCY).
+
+    Saat traffic spike request berlebih menunggu sebentar di sini alih-alih membanjiri
+    upstream lalu timeout karena di-throttle. Dibuat per event loop seperti client-nya.
+    """
+    global _upstream_limit, _upstream_limit_loop
+    loop = asyncio.get_running_loop()
+    if _upstream_limit is None or _upstream_limit_loop is not loop:
+        _upstream_limit = asyncio.Semaphore(TRANSTRACK_MAX_CONCURRENCY)
+        _upstream_limit_loop = loop
+    return _upstream_limit
+
+
+async def close_http_client() -> None:
+    """Tutup shared client (dipanggil saat shutdown aplikasi)"""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
@@ -0,0 +1,59 @@
+import logging
+import logging.handlers
+import queue
+from typing import Optional
+
+from app.core.config import LOG_FILE, LOG_FILE_BACKUP_COUNT, LOG_FILE_MAX_BYTES, LOG_LEVEL
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+def setup_logging() -> None:
+    """
+    Pasang logging untuk logger "app.*" lewat QueueHandler + QueueListener.
+
+    Request coroutine hanya meng-enqueue record; penulisan ke console / file (I/O blocking)
+    dilakukan thread QueueListener sehingga tidak memblokir event loop.
+    Dipanggil di lifespan startup (per worker, setelah fork).
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if LOG_FILE:
+        # File log opsional (filesystem Vercel read-only); rotasi agar tidak tumbuh tanpa batas
+        handlers.append(logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUP_COUNT, encoding="utf-8"
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.addHandler(_queue_handler)
+    app_logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush sisa record di queue lalu hentikan thread listener (lifespan shutdown)"""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    app_logger = logging.getLogger("app")
+    app_logger.removeHandler(_queue_handler)
+    app_logger.propagate = True
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _queue_handler = None
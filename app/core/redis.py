@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from typing import Optional
+
+from app.core.config import REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+# redis opsional: tanpa package redis / REDIS_URL semua fitur berbasis Redis dinonaktifkan.
+# Package hanya di-import jika REDIS_URL di-set (~50 ms import time saat cold start tanpa Redis)
+HAS_REDIS = False
+if REDIS_URL:
+    try:
+        import redis.asyncio as aioredis
+        HAS_REDIS = True
+    except ImportError:
+        pass
+
+_client = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def redis_enabled() -> bool:
+    """True jika REDIS_URL di-set dan package redis terpasang"""
+    return bool(REDIS_URL) and HAS_REDIS
+
+
+def get_redis():
+    """
+    Shared redis.asyncio client (connection pool) per event loop.
+
+    Returns:
+        Redis client atau None jika Redis tidak dikonfigurasi
+    """
+    global _client, _client_loop
+    if not redis_enabled():
+        return None
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = aioredis.from_url(REDIS_URL)
+        _client_loop = loop
+    return _client
+
+
+async def close_redis() -> None:
+    """Tutup shared client (dipanggil saat shutdown aplikasi)"""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
@@ -0,0 +1,82 @@
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+# orjson opsional: tanpa orjson response tetap di-serialize dengan json stdlib
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response yang di-serialize dengan orjson (C), termasuk numpy scalar/array.
+
+    Versi lokal dari fastapi.responses.ORJSONResponse (deprecated di FastAPI terbaru)
+    dan jatuh ke JSONResponse biasa jika orjson tidak terpasang.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
+
+
+def model_response(model: BaseModel, status_code: int = 200) -> Response:
+    """
+    Serialize model Pydantic yang sudah tervalidasi langsung ke JSON bytes.
+
+    Dipakai endpoint dengan response_model=None: FastAPI tidak memvalidasi ulang
+    output yang memang sudah dibangun sebagai model oleh service.
+    """
+    return Response(content=model.model_dump_json(), status_code=status_code, media_type="application/json")
+
+
+def render_json(content: Any) -> bytes:
+    """Render content ke JSON bytes (orjson; fallback json stdlib seperti JSONResponse)"""
+    if HAS_ORJSON:
+        return orjson.dumps(
+            content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def load_json(raw: bytes) -> Any:
+    """Decode JSON bytes (orjson; fallback json stdlib). Error decode adalah ValueError"""
+    return orjson.loads(raw) if HAS_ORJSON else json.loads(raw)
+
+
+def json_bytes_response(body: bytes) -> Response:
+    """Bungkus JSON bytes yang sudah di-render (mis. hasil cache) menjadi Response"""
+    return Response(content=body, media_type="application/json")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Cek header If-None-Match (bisa berisi beberapa ETag / weak ETag)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
+
+
+def etag_json_response(body: bytes, if_none_match: Optional[str]) -> Response:
+    """
+    JSON bytes response dengan strong ETag (blake2b dari body).
+
+    Jika If-None-Match cocok, kirim 304 tanpa body sehingga poll berulang atas data
+    yang sama hanya berukuran header.
+    """
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
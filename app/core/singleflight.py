@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+def _cancelling() -> bool:
+    """True jika task saat ini sedang di-cancel (Task.cancelling ada sejak Python 3.11)"""
+    task = asyncio.current_task()
+    cancelling = getattr(task, "cancelling", None)
+    return bool(cancelling and cancelling())
+
+
+class SingleFlight:
+    """
+    Gabungkan pemanggilan async identik yang sedang berjalan (single-flight).
+
+    Caller pertama untuk sebuah key menjalankan func; caller lain dengan key yang sama
+    selama call itu belum selesai menunggu hasil (atau exception) yang sama, tanpa
+    request tambahan ke upstream. Tidak ada caching setelah call selesai.
+    Jika caller pertama di-cancel, salah satu follower menjalankan ulang func.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        while (future := self._inflight.get(key)) is not None:
+            try:
+                # shield: follower yang di-cancel tidak ikut membatalkan call milik caller pertama
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Caller pertama di-cancel (mis. client-nya disconnect): follower tidak ikut gagal,
+                # tapi mencoba lagi sebagai caller pertama yang baru. Cancel follower sendiri diteruskan
+                if not future.cancelled() or _cancelling():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Tandai sudah diambil agar tidak di-log "exception was never retrieved" tanpa follower
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
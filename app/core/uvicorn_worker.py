@@ -0,0 +1,12 @@
+from uvicorn.workers import UvicornWorker
+
+
+class UvloopWorker(UvicornWorker):
+    """
+    Uvicorn worker untuk Gunicorn dengan event loop uvloop dan HTTP parser httptools.
+
+    Dipaksa eksplisit (bukan "auto") supaya deployment gagal jelas jika dependency
+    tidak terpasang, alih-alih diam-diam jatuh ke asyncio + h11 yang lebih lambat.
+    """
+
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
@@ -1,13 +1,56 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api.router import router as main_router
+from fastapi.middleware.gzip import GZipMiddleware
+from app.api.router import get_openapi_body, router as main_router
 from app.api.v1.router import api_router
+from app.core.config import GZIP_COMPRESS_LEVEL, GZIP_MINIMUM_SIZE
+from app.core.http import close_http_client, get_http_client
+from app.core.logging import setup_logging, shutdown_logging
+from app.core.redis import close_redis
+from app.core.responses import ORJSONResponse
+from app.services import _numba_rules, anomaly_service, emission_service
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Log ditulis thread QueueListener, bukan dari coroutine request
+    setup_logging()
+    # uvloop aktif jika dijalankan lewat UvloopWorker (gunicorn_config.py) atau --loop uvloop
+    loop_cls = type(asyncio.get_running_loop())
+    logger.info(f"Event loop: {loop_cls.__module__}.{loop_cls.__name__}")
+    # Compile kernel rule-based di startup agar request pertama tidak menanggung JIT
+    _numba_rules.warmup()
+    # Load model ML (per worker, setelah fork) sebelum request pertama
+    anomaly_service.warmup()
+    emission_service.warmup()
+    # Shared HTTP client untuk Transtrack (connection pool + keep-alive)
+    get_http_client()
+    # Render OpenAPI schema sekali, /openapi.json hanya mengirim bytes yang sama
+    get_openapi_body(app)
+    yield
+    await close_http_client()
+    await close_redis()
+    shutdown_logging()
 
 
 app = FastAPI(
     title="TransTRACK API",
     description="Predictive Emission Forecasting & Anomaly Detection",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+    # /openapi.json, /docs dan /redoc disajikan app.api.router dari schema yang sudah di-render
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None,
 )
 
+# History (17 field x ribuan titik) dan CSV sangat compressible; response kecil tidak dikompres
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_COMPRESS_LEVEL)
+
 app.include_router(main_router) # add main router for general routes
-app.include_router(api_router, prefix="/api/v1")
\ No newline at end of file
+app.include_router(api_router, prefix="/api/v1")
@@ -0,0 +1,43 @@
+"""
+Export Isolation Forest (+ scaler) ke ONNX untuk inference via onnxruntime.
+
+Jalankan sekali setiap model di-retrain (butuh skl2onnx, tidak perlu di production):
+
+    python -m app.models.anomaly_model
+"""
+import os
+import joblib
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), 'anomaly')
+ONNX_FILENAME = 'model_isolation_forest.onnx'
+N_FEATURES = 8
+
+
+def export_isolation_forest_onnx(output_path: str = None) -> str:
+    """Gabungkan scaler + Isolation Forest jadi satu graph ONNX dengan input float32 'X' (N, 8)"""
+    import numpy as np
+    from onnx import helper
+    from skl2onnx import to_onnx
+    from sklearn.pipeline import make_pipeline
+
+    scaler = joblib.load(os.path.join(MODEL_DIR, 'scaler_anomaly_detection.pkl'))
+    model_if = joblib.load(os.path.join(MODEL_DIR, 'model_isolation_forest.pkl'))
+
+    pipeline = make_pipeline(scaler, model_if)
+    onx = to_onnx(
+        pipeline,
+        np.zeros((1, N_FEATURES), dtype=np.float32),
+        target_opset={'': 17, 'ai.onnx.ml': 3}
+    )
+    # Output 'scores' = decision_function = score_samples - offset_,
+    # simpan offset_ agar score_samples bisa direkonstruksi tanpa load pickle
+    helper.set_model_props(onx, {'offset': repr(float(model_if.offset_))})
+
+    output_path = output_path or os.path.join(MODEL_DIR, ONNX_FILENAME)
+    with open(output_path, 'wb') as f:
+        f.write(onx.SerializeToString())
+    return output_path
+
+
+if __name__ == '__main__':
+    print(export_isolation_forest_onnx())
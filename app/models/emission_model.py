@@ -1,13 +1,134 @@
+"""
+Export model emisi (scaler + RandomForestRegressor) ke ONNX untuk inference via onnxruntime.
+
+Jalankan sekali setiap model di-retrain (butuh onnx>=1.16, tidak perlu di production):
+
+    python -m app.models.emission_model
+
+Graph dibangun langsung dengan operator ai.onnx.ml.TreeEnsemble (opset 5) dalam double,
+bukan lewat skl2onnx: TreeEnsembleRegressor (opset 3) selalu mengeluarkan float32, padahal
+prediksi CO2 emissions berorde 1e6 gram sehingga hasil round(..., 2) akan berubah.
+"""
+import os
 import joblib
 
+MODEL_DIR = os.path.join(os.path.dirname(__file__), 'emission')
+N_FEATURES = 12
+
+# (pickle model, pickle scaler, file ONNX hasil export)
+EMISSION_MODELS = (
+    ('model_co2_emissions.pkl', 'scaler_co2_emissions.pkl', 'model_co2_emissions.onnx'),
+    ('model_co2_intensity.pkl', 'scaler_co2_intensity.pkl', 'model_co2_intensity.onnx'),
+)
+
+
+def _forest_node(model, input_name: str, output_name: str):
+    """Node TreeEnsemble (AVERAGE, BRANCH_LEQ) dengan threshold dan leaf double seperti sklearn"""
+    import numpy as np
+    from onnx import helper, numpy_helper
+
+    featureids, splits, roots = [], [], []
+    true_ids, true_leafs, false_ids, false_leafs = [], [], [], []
+    leaf_weights = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        internal = np.flatnonzero(~is_leaf)
+        leaves = np.flatnonzero(is_leaf)
+        # Node internal dan leaf dinomori terpisah (global untuk semua tree)
+        node_index = np.full(tree.node_count, -1)
+        node_index[internal] = np.arange(len(internal)) + len(featureids)
+        leaf_index = np.full(tree.node_count, -1)
+        leaf_index[leaves] = np.arange(len(leaves)) + len(leaf_weights)
+
+        roots.append(len(featureids))
+        if len(internal) == 0:
+            # Tree satu leaf: split dummy yang kedua cabangnya ke leaf tersebut
+            featureids.append(0)
+            splits.append(0.0)
+            true_ids.append(int(leaf_index[0]))
+            true_leafs.append(1)
+            false_ids.append(int(leaf_index[0]))
+            false_leafs.append(1)
+        for i in internal:
+            featureids.append(int(tree.feature[i]))
+            splits.append(float(tree.threshold[i]))
+            # sklearn: X <= threshold -> children_left
+            for child, ids, flags in ((tree.children_left[i], true_ids, true_leafs),
+                                      (tree.children_right[i], false_ids, false_leafs)):
+                if is_leaf[child]:
+                    ids.append(int(leaf_index[child]))
+                    flags.append(1)
+                else:
+                    ids.append(int(node_index[child]))
+                    flags.append(0)
+        leaf_weights.extend(tree.value[leaves, 0, 0].tolist())
+
+    return helper.make_node(
+        'TreeEnsemble', [input_name], [output_name], domain='ai.onnx.ml',
+        tree_roots=roots,
+        nodes_featureids=featureids,
+        nodes_splits=numpy_helper.from_array(np.asarray(splits, dtype=np.float64)),
+        nodes_modes=numpy_helper.from_array(np.zeros(len(splits), dtype=np.uint8)),
+        nodes_truenodeids=true_ids,
+        nodes_trueleafs=true_leafs,
+        nodes_falsenodeids=false_ids,
+        nodes_falseleafs=false_leafs,
+        leaf_targetids=[0] * len(leaf_weights),
+        leaf_weights=numpy_helper.from_array(np.asarray(leaf_weights, dtype=np.float64)),
+        n_targets=1,
+        aggregate_function=0,  # AVERAGE, sama dengan RandomForestRegressor.predict
+        post_transform=0,
+    )
+
+
+def build_emission_onnx(scaler, model):
+    """Graph ONNX input double 'X' (N, 12) -> output double 'Y' (N, 1)"""
+    import numpy as np
+    from onnx import TensorProto, helper, numpy_helper
+
+    mean = numpy_helper.from_array(np.asarray(scaler.mean_, dtype=np.float64).reshape(1, N_FEATURES), 'mean')
+    scale = numpy_helper.from_array(np.asarray(scaler.scale_, dtype=np.float64).reshape(1, N_FEATURES), 'scale')
+    nodes = [
+        # StandardScaler.transform dalam double
+        helper.make_node('Sub', ['X', 'mean'], ['centered']),
+        helper.make_node('Div', ['centered', 'scale'], ['scaled']),
+        # sklearn meng-cast input tree ke float32 sebelum dibandingkan dengan threshold double
+        helper.make_node('Cast', ['scaled'], ['scaled_float'], to=TensorProto.FLOAT),
+        helper.make_node('Cast', ['scaled_float'], ['tree_input'], to=TensorProto.DOUBLE),
+        _forest_node(model, 'tree_input', 'Y'),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        'emission_random_forest',
+        [helper.make_tensor_value_info('X', TensorProto.DOUBLE, [None, N_FEATURES])],
+        [helper.make_tensor_value_info('Y', TensorProto.DOUBLE, [None, 1])],
+        initializer=[mean, scale],
+    )
+    onx = helper.make_model(
+        graph, opset_imports=[helper.make_opsetid('', 21), helper.make_opsetid('ai.onnx.ml', 5)]
+    )
+    # IR 10 supaya bisa dibaca onnxruntime yang lebih lama dari paket onnx pembuatnya
+    onx.ir_version = 10
+    return onx
 
-# class EmissionModel:
-#     def __init__(self):
-#         self.model = joblib.load("model/emission_model.pkl")
 
+def export_emission_onnx(output_dir: str = None) -> list:
+    """Export kedua model emisi; return list path file ONNX"""
+    output_dir = output_dir or MODEL_DIR
+    paths = []
+    for model_file, scaler_file, onnx_file in EMISSION_MODELS:
+        model = joblib.load(os.path.join(MODEL_DIR, model_file))
+        scaler = joblib.load(os.path.join(MODEL_DIR, scaler_file))
+        onx = build_emission_onnx(scaler, model)
 
-#     def predict(self, X):
-#         return self.model.predict([X])[0]
+        output_path = os.path.join(output_dir, onnx_file)
+        with open(output_path, 'wb') as f:
+            f.write(onx.SerializeToString())
+        paths.append(output_path)
+    return paths
 
 
-# model = EmissionModel()
\ No newline at end of file
+if __name__ == '__main__':
+    for path in export_emission_onnx():
+        print(path)
@@ -62,6 +62,18 @@ class ExcessiveIdleDetectionOutput(BaseModel):
     excess_time: float = Field(..., description="Selisih dari threshold (menit)")
 
 
+class ExcessiveIdleBatchInput(BaseModel):
+    """Schema untuk excessive idle detection banyak device sekaligus (mis. laporan harian armada)"""
+    items: List[ExcessiveIdleDetectionInput] = Field(..., description="Idle harian per device", min_length=1, max_length=5000)
+
+
+class ExcessiveIdleBatchOutput(BaseModel):
+    """Schema untuk output excessive idle detection batch (urutan results sama dengan items)"""
+    total_devices: int = Field(..., description="Jumlah device yang dievaluasi")
+    excessive_count: int = Field(..., description="Jumlah device dengan idle berlebihan")
+    results: List[ExcessiveIdleDetectionOutput] = Field(..., description="Hasil per device")
+
+
 class EmissionInefficientDetectionInput(BaseModel):
     """Schema untuk emission inefficiency detection"""
     co2_intensity: float = Field(..., description="CO2 intensity value (g/km)", ge=0)
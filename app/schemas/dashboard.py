@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class BatchMetricsRequest(BaseModel):
+    """Schema untuk dashboard metrics beberapa kendaraan sekaligus"""
+    devices: List[int] = Field(..., description="List device ID dari devices list", min_length=1, max_length=50)
@@ -1,9 +1,11 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from typing import Optional
 
 
 class EmissionRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     timestamp: datetime
     device_id: int
     odometer_km: float
@@ -21,6 +23,8 @@ class EmissionResponse(BaseModel):
 
 class EmissionPredictionInput(BaseModel):
     """Schema untuk prediksi emisi berdasarkan aggregated hourly features"""
+    model_config = ConfigDict(frozen=True)
+
     speed_mean: float = Field(..., description="Rata-rata kecepatan dalam 1 jam (km/h)", ge=0)
     speed_max: float = Field(..., description="Kecepatan maksimum dalam 1 jam (km/h)", ge=0)
     speed_std: float = Field(default=0, description="Standar deviasi kecepatan dalam 1 jam", ge=0)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
-from enum import Enum
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, WithJsonSchema
+from typing import Annotated, List, Dict, Any, Literal, Optional
+from enum import Enum, IntEnum
 from datetime import datetime
 
 
@@ -23,13 +23,48 @@ class NotificationType(str, Enum):
     SYSTEM_INFO = "SYSTEM_INFO"
 
 
+class StatusColor(IntEnum):
+    """Status warna dashboard; dibandingkan sebagai int, bukan string emoji"""
+    GREEN = 0
+    YELLOW = 1
+    RED = 2
+
+
+# Marker label status dari dashboard ("🔴 Red (Critical)", "🟡 Yellow (Warning)", "🟢 Green (Good)")
+_STATUS_COLOR_MARKERS = (
+    (StatusColor.RED, ("🔴", "red")),
+    (StatusColor.YELLOW, ("🟡", "yellow")),
+    (StatusColor.GREEN, ("🟢", "green")),
+)
+
+
+def _parse_status_color(value: Any) -> Any:
+    """Petakan label status (emoji / nama warna) ke StatusColor sekali saat validasi"""
+    if isinstance(value, str):
+        lowered = value.lower()
+        for color, markers in _STATUS_COLOR_MARKERS:
+            if any(marker in lowered for marker in markers):
+                return color
+    return value
+
+
+# Di API tetap berupa label string dashboard (atau 0/1/2), di dalam service berupa StatusColor
+StatusColorField = Annotated[
+    StatusColor,
+    BeforeValidator(_parse_status_color),
+    WithJsonSchema({"type": "string", "examples": ["🟢 Green (Good)", "🟡 Yellow (Warning)", "🔴 Red (Critical)"]}),
+]
+
+
 class DashboardNotificationInput(BaseModel):
     """Schema untuk generate notifikasi berdasarkan dashboard metrics"""
+    model_config = ConfigDict(frozen=True)
+
     device_id: int = Field(..., description="Device ID")
     total_emissions_kg: float = Field(..., description="Total emisi harian (kgCO2)", ge=0)
     emission_intensity_gco2_km: float = Field(..., description="Intensitas emisi (gCO2/km)", ge=0)
     idle_time_hours: float = Field(..., description="Total idle time (jam)", ge=0)
-    status_color: str = Field(..., description="Status warna (🟢 Green/🟡 Yellow/🔴 Red)")
+    status_color: StatusColorField = Field(..., description="Status warna (🟢 Green/🟡 Yellow/🔴 Red)")
     total_fuel_consumed_l: float = Field(default=0, description="Total fuel consumed (liter)", ge=0)
     total_distance_km: float = Field(default=0, description="Total distance (km)", ge=0)
     has_theft_alert: bool = Field(default=False, description="Apakah ada fuel theft alert")
@@ -60,12 +95,20 @@ class DashboardNotificationOutput(BaseModel):
     requires_immediate_action: bool = Field(..., description="Apakah perlu immediate action")
 
 
+# Nilai anomaly_types dari /anomaly/detect (+ excessive idle) dan SeverityLevel;
+# Literal divalidasi pydantic-core sebagai lookup set, bukan string bebas
+AnomalyType = Literal['fuel_theft', 'emission_inefficient', 'ml_detected', 'excessive_idle']
+AnomalySeverity = Literal['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+
+
 class AnomalyNotificationInput(BaseModel):
     """Schema untuk notifikasi anomaly detection"""
+    model_config = ConfigDict(frozen=True)
+
     device_id: int = Field(..., description="Device ID")
-    anomaly_type: str = Field(..., description="Tipe anomali (fuel_theft, emission_inefficient, dll)")
+    anomaly_type: AnomalyType = Field(..., description="Tipe anomali (fuel_theft, emission_inefficient, dll)")
     anomaly_score: float = Field(..., description="Anomaly score", ge=-1, le=1)
-    severity: str = Field(..., description="Severity level (LOW, MEDIUM, HIGH, CRITICAL)")
+    severity: AnomalySeverity = Field(..., description="Severity level (LOW, MEDIUM, HIGH, CRITICAL)")
     confidence: float = Field(..., description="Confidence score", ge=0, le=1)
     details: Optional[Dict[str, Any]] = Field(default=None, description="Detail anomali")
 
@@ -85,6 +128,8 @@ class AnomalyNotificationOutput(BaseModel):
 
 class NotificationHistoryInput(BaseModel):
     """Schema untuk query notification history"""
+    model_config = ConfigDict(frozen=True)
+
     device_id: int = Field(..., description="Device ID")
     limit: int = Field(default=50, description="Jumlah notifikasi yang diambil", ge=1, le=1000)
     notification_type: Optional[NotificationType] = Field(default=None, description="Filter by type")
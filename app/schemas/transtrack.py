@@ -0,0 +1,56 @@
+from pydantic import BaseModel, Field
+from typing import Any, List, Optional
+# typing_extensions: pydantic butuh TypedDict versi ini di Python < 3.12 untuk generate schema
+from typing_extensions import NotRequired, TypedDict
+
+
+class DeviceSummary(TypedDict):
+    """
+    Item /devices-summary (hasil simplify_devices).
+
+    TypedDict, bukan BaseModel: hanya untuk type hint dan dokumentasi OpenAPI; response
+    tidak divalidasi ulang oleh pydantic.
+    """
+    id: Any
+    name: Optional[str]
+    online: Any
+    time: Optional[str]
+    speed: Optional[float]
+    total_distance: Optional[float]
+    lat: Optional[float]
+    lng: Optional[float]
+    altitude: Optional[float]
+    plate_number: NotRequired[Optional[str]]
+    driver_name: NotRequired[Optional[str]]
+
+
+class ProcessedHistoryItem(TypedDict):
+    """Item /history-processed (hasil process_history_data); tidak divalidasi ulang"""
+    timestamp: Optional[str]
+    device_id: Any
+    latitude: Optional[float]
+    longitude: Optional[float]
+    speed: Optional[float]
+    ignition: Optional[bool]
+    motion: Optional[bool]
+    odometer_km: Optional[float]
+    engine_hours: Optional[float]
+    fuel_level_l: Optional[float]
+    rpm: Optional[float]
+    battery_voltage: Optional[float]
+    sat: Optional[float]
+    hdop: Optional[float]
+    pdop: Optional[float]
+    valid: bool
+    status: Optional[str]
+
+
+class Coordinate(BaseModel):
+    """Satu titik koordinat untuk reverse geocoding"""
+    lat: float = Field(..., description="Latitude", ge=-90, le=90)
+    lon: float = Field(..., description="Longitude", ge=-180, le=180)
+
+
+class AddressBatchRequest(BaseModel):
+    """Schema untuk reverse geocoding beberapa titik sekaligus"""
+    points: List[Coordinate] = Field(..., description="List koordinat", min_length=1, max_length=100)
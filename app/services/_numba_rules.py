@@ -0,0 +1,149 @@
+import math
+import logging
+from typing import Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Numba opsional: tanpa numba kernel tetap jalan sebagai fungsi Python biasa
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+_SQRT2 = math.sqrt(2.0)
+
+
+@njit(cache=True)
+def _fuel_theft(speed: float, distance_delta: float, fuel_delta: float,
+                threshold: float) -> Tuple[bool, bool, bool, bool, float]:
+    """
+    Kernel rule fuel theft
+
+    Returns:
+        (is_fuel_theft, large_fuel_drop, vehicle_stationary, no_movement, risk_score)
+    """
+    large_fuel_drop = fuel_delta < threshold
+    vehicle_stationary = speed == 0.0
+    no_movement = distance_delta < 0.1
+    is_fuel_theft = large_fuel_drop and vehicle_stationary and no_movement
+
+    # Normalize fuel drop relative to threshold (0-1)
+    risk_score = 0.0
+    if large_fuel_drop:
+        risk_score = min(1.0, abs(fuel_delta) / abs(threshold))
+
+    return is_fuel_theft, large_fuel_drop, vehicle_stationary, no_movement, risk_score
+
+
+@njit(cache=True)
+def _excessive_idle(idle_duration_daily: float, threshold: float) -> Tuple[bool, float]:
+    """
+    Kernel rule excessive idle
+
+    Returns:
+        (is_excessive, excess_time)
+    """
+    is_excessive = idle_duration_daily > threshold
+    excess_time = max(0.0, idle_duration_daily - threshold)
+    return is_excessive, excess_time
+
+
+@njit(cache=True)
+def _normal_percentile(deviation: float) -> float:
+    """Normal CDF (0-100) via erfc (setara scipy.stats.norm.cdf, akurat juga di ekor kiri)"""
+    return 0.5 * math.erfc(-deviation / _SQRT2) * 100.0
+
+
+@njit(cache=True)
+def _emission_inefficiency(co2_intensity: float, co2_mean: float,
+                           co2_std: float) -> Tuple[bool, float, float, float]:
+    """
+    Kernel rule emission inefficiency (CO2 intensity > mean + 2*std)
+
+    Returns:
+        (is_inefficient, threshold, deviation, percentile)
+    """
+    threshold = co2_mean + 2.0 * co2_std
+    is_inefficient = co2_intensity > threshold
+
+    # Deviation dalam satuan std dev
+    deviation = (co2_intensity - co2_mean) / co2_std if co2_std > 0 else 0.0
+
+    return is_inefficient, threshold, deviation, _normal_percentile(deviation)
+
+
+@njit(cache=True)
+def _rules_batch(speed: np.ndarray, distance_delta: np.ndarray, fuel_delta: np.ndarray,
+                 co2_intensity: np.ndarray, fuel_theft_threshold: float,
+                 co2_mean: float, co2_std: float) -> Tuple[np.ndarray, ...]:
+    """
+    Kernel gabungan rule fuel theft + emission inefficiency untuk N record (array float64)
+
+    Ditulis sebagai ekspresi array supaya tetap vektor tanpa numba; dengan numba
+    di-fuse. Sengaja tanpa parallel=True: kernel dipanggil dari thread executor ML
+    (batch <= BATCH_MAX_SIZE) dan threading layer numba tidak aman dipanggil paralel.
+    Hasil per elemen sama dengan _fuel_theft / _emission_inefficiency.
+    Percentile tidak dihitung di sini (erfc tidak tersedia sebagai ufunc numpy),
+    pakai _normal_percentile(deviation) per record.
+
+    Returns:
+        (is_fuel_theft, large_fuel_drop, vehicle_stationary, no_movement, risk_score,
+         is_inefficient, threshold, deviation); threshold berupa scalar, sisanya array (N,)
+    """
+    large_fuel_drop = fuel_delta < fuel_theft_threshold
+    vehicle_stationary = speed == 0.0
+    no_movement = distance_delta < 0.1
+    is_fuel_theft = large_fuel_drop & vehicle_stationary & no_movement
+    risk_score = np.where(
+        large_fuel_drop, np.minimum(1.0, np.abs(fuel_delta) / abs(fuel_theft_threshold)), 0.0
+    )
+
+    threshold = co2_mean + 2.0 * co2_std
+    is_inefficient = co2_intensity > threshold
+    if co2_std > 0:
+        deviation = (co2_intensity - co2_mean) / co2_std
+    else:
+        deviation = np.zeros_like(co2_intensity)
+
+    return (is_fuel_theft, large_fuel_drop, vehicle_stationary, no_movement, risk_score,
+            is_inefficient, threshold, deviation)
+
+
+@njit(cache=True)
+def _accumulate_deltas(fuel_level: np.ndarray, odometer: np.ndarray) -> Tuple[float, float]:
+    """
+    Kernel total fuel consumed dan total distance dari history terurut (array float64)
+
+    Fuel consumed = penurunan level antar record (0 < delta < 100 L), distance =
+    kenaikan odometer (0 < delta < 200 km); delta di luar range dianggap refuel/outlier.
+
+    Returns:
+        (total_fuel_consumed_l, total_distance_km)
+    """
+    fuel_consumed = fuel_level[:-1] - fuel_level[1:]
+    distance = odometer[1:] - odometer[:-1]
+    total_fuel = fuel_consumed[(fuel_consumed > 0.0) & (fuel_consumed < 100.0)].sum()
+    total_distance = distance[(distance > 0.0) & (distance < 200.0)].sum()
+    return float(total_fuel), float(total_distance)
+
+
+def warmup() -> None:
+    """Panggil setiap kernel sekali dengan dummy args agar kompilasi JIT tidak terjadi saat request pertama"""
+    if not HAS_NUMBA:
+        return
+    _fuel_theft(0.0, 0.0, -10.0, -5.0)
+    _excessive_idle(180.0, 120.0)
+    _emission_inefficiency(300.0, 150.0, 50.0)
+    dummy = np.zeros(2)
+    _rules_batch(dummy, dummy, dummy, dummy, -5.0, 150.0, 50.0)
+    _accumulate_deltas(dummy, dummy)
+    logger.info("Numba rule kernels compiled")
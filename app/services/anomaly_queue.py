@@ -0,0 +1,177 @@
+"""
+Redis stream queue untuk /anomaly/detect.
+
+API hanya meng-enqueue request (XADD) lalu menunggu hasil di list per correlation id;
+inference dijalankan oleh worker terpisah yang bisa di-scale independen dari API.
+Aktif hanya jika ANOMALY_QUEUE_ENABLED=true (dan REDIS_URL di-set) di API maupun worker:
+
+    ANOMALY_QUEUE_ENABLED=true REDIS_URL=redis://... python -m app.services.anomaly_queue
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, List, Tuple
+
+from app.core.batching import QueueFullError
+from app.core.config import (
+    ANOMALY_QUEUE_CLAIM_IDLE_MS,
+    ANOMALY_QUEUE_ENABLED,
+    ANOMALY_QUEUE_GROUP,
+    ANOMALY_QUEUE_MAX_LEN,
+    ANOMALY_QUEUE_RESULT_TIMEOUT,
+    ANOMALY_QUEUE_STREAM,
+    BATCH_MAX_SIZE,
+)
+from app.core.executors import run_in_executor
+from app.core.logging import setup_logging
+from app.core.redis import get_redis, redis_enabled
+from app.schemas.anomaly import AnomalyDetectionInput, AnomalyDetectionOutput
+from app.services import _numba_rules
+from app.services.anomaly_service import predict_anomaly_batch, warmup
+
+logger = logging.getLogger(__name__)
+
+# Hasil disimpan sementara di list ini; key expire jika client sudah tidak menunggu
+RESULT_KEY_PREFIX = "anomaly:out:"
+RESULT_TTL_SECONDS = int(ANOMALY_QUEUE_RESULT_TIMEOUT) + 30
+
+
+class AnomalyWorkerError(Exception):
+    """Worker gagal memproses request (pesan error dikirim balik lewat result list)"""
+
+
+def anomaly_queue_enabled() -> bool:
+    """True jika ANOMALY_QUEUE_ENABLED=true dan Redis tersedia"""
+    return ANOMALY_QUEUE_ENABLED and redis_enabled()
+
+
+async def enqueue_anomaly(data: AnomalyDetectionInput) -> AnomalyDetectionOutput:
+    """
+    Kirim request ke stream dan tunggu hasil dari worker
+
+    Raises:
+        QueueFullError: jika panjang stream melebihi ANOMALY_QUEUE_MAX_LEN (backpressure)
+        TimeoutError: jika worker tidak mengembalikan hasil dalam ANOMALY_QUEUE_RESULT_TIMEOUT
+        AnomalyWorkerError: jika worker gagal memproses request
+    """
+    redis = get_redis()
+    if await redis.xlen(ANOMALY_QUEUE_STREAM) >= ANOMALY_QUEUE_MAX_LEN:
+        raise QueueFullError(f"{ANOMALY_QUEUE_STREAM} is full")
+
+    cid = uuid.uuid4().hex
+    await redis.xadd(ANOMALY_QUEUE_STREAM, {"cid": cid, "payload": data.model_dump_json()})
+
+    # BLPOP (bukan pub/sub) supaya hasil yang di-push sebelum kita mulai menunggu tidak hilang
+    result = await redis.blpop([RESULT_KEY_PREFIX + cid], timeout=ANOMALY_QUEUE_RESULT_TIMEOUT)
+    if result is None:
+        raise TimeoutError("Anomaly worker did not respond in time")
+
+    _, raw = result
+    if raw.startswith(b"!"):
+        raise AnomalyWorkerError(raw[1:].decode())
+    return AnomalyDetectionOutput.model_validate_json(raw)
+
+
+async def _ensure_group(redis) -> None:
+    try:
+        await redis.xgroup_create(ANOMALY_QUEUE_STREAM, ANOMALY_QUEUE_GROUP, id="0", mkstream=True)
+    except Exception as e:
+        # BUSYGROUP: group sudah dibuat worker lain
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def _publish_results(redis, ids: List[bytes], cids: List[str], results: List[bytes]) -> None:
+    async with redis.pipeline(transaction=False) as pipe:
+        for cid, raw in zip(cids, results):
+            key = RESULT_KEY_PREFIX + cid
+            pipe.rpush(key, raw)
+            pipe.expire(key, RESULT_TTL_SECONDS)
+        pipe.xack(ANOMALY_QUEUE_STREAM, ANOMALY_QUEUE_GROUP, *ids)
+        pipe.xdel(ANOMALY_QUEUE_STREAM, *ids)
+        await pipe.execute()
+
+
+def _entry_age_ms(entry_id: bytes) -> int:
+    """Umur entry stream dari bagian timestamp ID-nya (<ms>-<seq>)"""
+    return int(time.time() * 1000) - int(entry_id.split(b"-", 1)[0])
+
+
+async def _process_entries(redis, entries: List[Tuple[bytes, Any]]) -> None:
+    """Jalankan satu batch inference untuk entries lalu publish hasil dan ACK"""
+    # Entry yang payload-nya sudah dihapus, atau client-nya sudah berhenti menunggu
+    # (umur > ANOMALY_QUEUE_RESULT_TIMEOUT), cukup di-ACK tanpa inference
+    timeout_ms = ANOMALY_QUEUE_RESULT_TIMEOUT * 1000
+    stale = [entry_id for entry_id, fields in entries if not fields or _entry_age_ms(entry_id) > timeout_ms]
+    if stale:
+        await redis.xack(ANOMALY_QUEUE_STREAM, ANOMALY_QUEUE_GROUP, *stale)
+        await redis.xdel(ANOMALY_QUEUE_STREAM, *stale)
+        entries = [(entry_id, fields) for entry_id, fields in entries if entry_id not in stale]
+    if not entries:
+        return
+
+    ids = [entry_id for entry_id, _ in entries]
+    cids = [fields[b"cid"].decode() for _, fields in entries]
+    try:
+        inputs = [AnomalyDetectionInput.model_validate_json(fields[b"payload"]) for _, fields in entries]
+        outputs = await run_in_executor(predict_anomaly_batch, inputs)
+        results = [output.model_dump_json().encode() for output in outputs]
+    except Exception as e:
+        logger.error(f"Anomaly worker batch of {len(entries)} failed: {e}")
+        results = [b"!" + str(e).encode()] * len(entries)
+
+    await _publish_results(redis, ids, cids, results)
+
+
+async def _claim_abandoned(redis, consumer: str) -> List[Tuple[bytes, Any]]:
+    """
+    Ambil alih entry pending milik worker lain yang idle > ANOMALY_QUEUE_CLAIM_IDLE_MS
+    (mis. worker crash setelah XREADGROUP), supaya request-nya tidak berakhir timeout
+    """
+    _, entries, *_ = await redis.xautoclaim(
+        ANOMALY_QUEUE_STREAM, ANOMALY_QUEUE_GROUP, consumer,
+        min_idle_time=ANOMALY_QUEUE_CLAIM_IDLE_MS, start_id="0-0", count=BATCH_MAX_SIZE
+    )
+    return entries
+
+
+async def run_worker(consumer: str = None, block_ms: int = 1000) -> None:
+    """
+    Loop worker: ambil hingga BATCH_MAX_SIZE request per XREADGROUP dan proses sebagai satu batch.
+    Entry pending worker lain yang ditinggalkan di-claim ulang setiap ~ANOMALY_QUEUE_CLAIM_IDLE_MS / 2.
+    """
+    if not anomaly_queue_enabled():
+        raise RuntimeError("Anomaly queue requires ANOMALY_QUEUE_ENABLED=true and REDIS_URL")
+    redis = get_redis()
+    consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+    await _ensure_group(redis)
+    logger.info(f"Anomaly worker {consumer} consuming {ANOMALY_QUEUE_STREAM}")
+
+    claim_interval = ANOMALY_QUEUE_CLAIM_IDLE_MS / 2000
+    next_claim = 0.0
+    while True:
+        if time.monotonic() >= next_claim:
+            claimed = await _claim_abandoned(redis, consumer)
+            if claimed:
+                logger.warning(f"Anomaly worker {consumer} reclaimed {len(claimed)} pending entries")
+                await _process_entries(redis, claimed)
+                continue
+            next_claim = time.monotonic() + claim_interval
+
+        response = await redis.xreadgroup(
+            ANOMALY_QUEUE_GROUP, consumer, {ANOMALY_QUEUE_STREAM: ">"},
+            count=BATCH_MAX_SIZE, block=block_ms
+        )
+        if response:
+            _, entries = response[0]
+            await _process_entries(redis, entries)
+
+
+if __name__ == "__main__":
+    setup_logging()
+    _numba_rules.warmup()
+    warmup()
+    asyncio.run(run_worker())
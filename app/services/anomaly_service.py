@@ -1,7 +1,19 @@
+import copy
 import pickle
+import logging
 import numpy as np
 import os
+from operator import attrgetter
 from typing import Dict, Any, List, Tuple
+from app.core.batching import AsyncBatcher
+from app.core.config import ANOMALY_SHORT_CIRCUIT, IFOREST_PARALLEL_MIN_SAMPLES, ORT_INTRA_OP_THREADS
+from app.services._numba_rules import (
+    _emission_inefficiency,
+    _excessive_idle,
+    _fuel_theft,
+    _normal_percentile,
+    _rules_batch,
+)
 from app.schemas.anomaly import (
     AnomalyDetectionInput,
     AnomalyDetectionOutput,
@@ -10,10 +22,13 @@ from app.schemas.anomaly import (
     FuelTheftDetectionOutput,
     ExcessiveIdleDetectionInput,
     ExcessiveIdleDetectionOutput,
+    ExcessiveIdleBatchOutput,
     EmissionInefficientDetectionInput,
     EmissionInefficientDetectionOutput
 )
 
+logger = logging.getLogger(__name__)
+
 # Try to import joblib as alternative
 try:
     import joblib
@@ -21,6 +36,13 @@ try:
 except ImportError:
     HAS_JOBLIB = False
 
+# onnxruntime opsional: fallback ke sklearn jika tidak terpasang
+try:
+    import onnxruntime as ort
+    HAS_ONNXRUNTIME = True
+except ImportError:
+    HAS_ONNXRUNTIME = False
+
 # Path ke model files
 # Use absolute path to ensure it works in both dev and production (Vercel)
 MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'models', 'anomaly'))
@@ -28,6 +50,21 @@ MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'model
 # Cache untuk loaded models
 _models_cache = {}
 
+# Graph ONNX scaler + Isolation Forest (lihat app/models/anomaly_model.py)
+ONNX_MODEL_FILENAME = 'model_isolation_forest.onnx'
+
+# Session onnxruntime (singleton); False = sudah dicoba dan tidak tersedia
+_onnx_session = None
+
+# Parameter anomaly detection (singleton, lihat get_anomaly_params)
+_anomaly_params = None
+
+# Fallback sklearn: Isolation Forest dengan scaler sudah dilebur ke threshold tree, lihat _get_iforest_model
+_iforest_model = None
+
+# Score yang dipakai jika Isolation Forest dilewati karena rule sudah decisive (-1 = pasti anomali)
+SHORT_CIRCUIT_ANOMALY_SCORE = -1.0
+
 # Default thresholds
 DEFAULT_THRESHOLDS = {
     'fuel_theft_threshold': -5.0,           # Liter
@@ -35,6 +72,47 @@ DEFAULT_THRESHOLDS = {
     'contamination_rate': 0.05              # 5% untuk Isolation Forest
 }
 
+# Base severity based on anomaly types (dipakai calculate_severity)
+ANOMALY_TYPE_SEVERITY = {
+    'fuel_theft': 0.95,          # CRITICAL
+    'ml_detected': 0.7,          # HIGH
+    'excessive_idle': 0.5,       # MEDIUM
+    'emission_inefficient': 0.4  # LOW to MEDIUM
+}
+
+# Satu bit per anomaly type; base severity maksimum setiap kombinasi type di-precompute
+# sehingga _build_anomaly_output cukup satu lookup list per sampel
+ANOMALY_TYPE_BITS = {anomaly_type: 1 << i for i, anomaly_type in enumerate(ANOMALY_TYPE_SEVERITY)}
+_MAX_TYPE_SEVERITY = [
+    max((score for anomaly_type, score in ANOMALY_TYPE_SEVERITY.items()
+         if mask & ANOMALY_TYPE_BITS[anomaly_type]), default=0.0)
+    for mask in range(1 << len(ANOMALY_TYPE_SEVERITY))
+]
+_FUEL_THEFT_BIT = ANOMALY_TYPE_BITS['fuel_theft']
+_ML_DETECTED_BIT = ANOMALY_TYPE_BITS['ml_detected']
+_EMISSION_INEFFICIENT_BIT = ANOMALY_TYPE_BITS['emission_inefficient']
+
+# Estimasi default populasi CO2 intensity (g/km) jika mean/std tidak diberikan
+DEFAULT_CO2_INTENSITY_MEAN = 150.0
+DEFAULT_CO2_INTENSITY_STD = 50.0
+
+# Feature list sesuai urutan saat training Isolation Forest
+ML_FEATURES = [
+    'speed',
+    'distance_delta',
+    'fuel_delta',
+    'fuel_consumption_rate',
+    'idle_duration',
+    'rpm',
+    'engine_load',
+    'co2_intensity'
+]
+
+# Ambil semua feature dalam urutan ML_FEATURES dengan satu call C (tuple of floats)
+_get_features = attrgetter(*ML_FEATURES)
+# Input rule-based untuk _rules_batch (urutan argumen kernel)
+_get_rule_inputs = attrgetter('speed', 'distance_delta', 'fuel_delta', 'co2_intensity')
+
 
 def load_model(filename: str):
     """Load model dari pickle file dengan caching dan compatibility handling"""
@@ -72,13 +150,30 @@ def load_model(filename: str):
 
 
 def get_anomaly_params() -> Dict[str, Any]:
-    """Get anomaly detection parameters"""
+    """Get anomaly detection parameters (di-load sekali per proses, termasuk fallback default)"""
+    global _anomaly_params
+    if _anomaly_params is None:
+        try:
+            _anomaly_params = load_model('anomaly_detection_params.pkl')
+        except Exception as e:
+            # Return default if file not found
+            _anomaly_params = DEFAULT_THRESHOLDS
+    return _anomaly_params
+
+
+def warmup() -> None:
+    """
+    Load params dan model anomaly di startup (lifespan) agar request pertama tidak
+    menanggung unpickle / pembuatan session, lalu jalankan satu inference dummy
+    (alokasi buffer onnxruntime / sklearn di run pertama).
+    """
+    get_anomaly_params()
     try:
-        params = load_model('anomaly_detection_params.pkl')
-        return params
+        if get_onnx_session() is None:
+            _get_iforest_model()
+        predict_ml_anomaly_batch(np.zeros((1, len(ML_FEATURES)), dtype=np.float32))
     except Exception as e:
-        # Return default if file not found
-        return DEFAULT_THRESHOLDS
+        logger.warning(f"Anomaly model warmup failed: {e}")
 
 
 def detect_fuel_theft(input_data: FuelTheftDetectionInput) -> Tuple[bool, Dict[str, Any]]:
@@ -90,39 +185,43 @@ def detect_fuel_theft(input_data: FuelTheftDetectionInput) -> Tuple[bool, Dict[s
     - Speed = 0 (kendaraan diam)
     - Distance delta < 0.1 km (tidak ada pergerakan)
     """
+    return _fuel_theft_result(input_data.speed, input_data.distance_delta, input_data.fuel_delta)
+
+
+def _fuel_theft_result(speed: float, distance_delta: float, fuel_delta: float) -> Tuple[bool, Dict[str, Any]]:
+    """Evaluasi rule fuel theft dari nilai yang sudah tervalidasi (tanpa membangun schema input)"""
     params = get_anomaly_params()
     fuel_theft_threshold = params.get('fuel_theft_threshold', DEFAULT_THRESHOLDS['fuel_theft_threshold'])
     
-    # Check criteria
-    large_fuel_drop = input_data.fuel_delta < fuel_theft_threshold
-    vehicle_stationary = input_data.speed == 0
-    no_movement = input_data.distance_delta < 0.1
-    
-    is_fuel_theft = large_fuel_drop and vehicle_stationary and no_movement
-    
-    # Calculate risk score (0-1)
-    if large_fuel_drop:
-        # Normalize fuel drop relative to threshold
-        risk_score = min(1.0, abs(input_data.fuel_delta) / abs(fuel_theft_threshold))
-    else:
-        risk_score = 0.0
-    
+    speed = float(speed)
+    distance_delta = float(distance_delta)
+    fuel_delta = float(fuel_delta)
+    return _fuel_theft_output(
+        speed, distance_delta, fuel_delta,
+        *_fuel_theft(speed, distance_delta, fuel_delta, float(fuel_theft_threshold))
+    )
+
+
+def _fuel_theft_output(speed: float, distance_delta: float, fuel_delta: float,
+                       is_fuel_theft: bool, large_fuel_drop: bool, vehicle_stationary: bool,
+                       no_movement: bool, risk_score: float) -> Tuple[bool, Dict[str, Any]]:
+    """Susun hasil rule fuel theft (details + reason) dari output kernel"""
     details = {
-        'large_fuel_drop': bool(large_fuel_drop),
-        'vehicle_stationary': bool(vehicle_stationary),
-        'no_movement': bool(no_movement),
-        'fuel_delta': float(input_data.fuel_delta),
-        'speed': float(input_data.speed),
-        'distance_delta': float(input_data.distance_delta)
+        'large_fuel_drop': large_fuel_drop,
+        'vehicle_stationary': vehicle_stationary,
+        'no_movement': no_movement,
+        'fuel_delta': fuel_delta,
+        'speed': speed,
+        'distance_delta': distance_delta
     }
     
     reason = ""
     if is_fuel_theft:
-        reason = f"Fuel theft detected: Large fuel drop ({input_data.fuel_delta}L) while stationary"
+        reason = f"Fuel theft detected: Large fuel drop ({fuel_delta}L) while stationary"
     elif large_fuel_drop and not vehicle_stationary:
-        reason = f"Suspicious fuel drop ({input_data.fuel_delta}L) while moving"
+        reason = f"Suspicious fuel drop ({fuel_delta}L) while moving"
     elif large_fuel_drop:
-        reason = f"Fuel drop detected ({input_data.fuel_delta}L) - monitoring required"
+        reason = f"Fuel drop detected ({fuel_delta}L) - monitoring required"
     else:
         reason = "Normal fuel consumption"
     
@@ -137,15 +236,16 @@ def detect_excessive_idle(input_data: ExcessiveIdleDetectionInput) -> Tuple[bool
     """
     params = get_anomaly_params()
     excessive_idle_threshold = params.get('excessive_idle_threshold', DEFAULT_THRESHOLDS['excessive_idle_threshold'])
+    # Nilai param bisa int (mis. 120); input sudah float dari pydantic
+    threshold = float(excessive_idle_threshold)
     
-    is_excessive = input_data.idle_duration_daily > excessive_idle_threshold
-    excess_time = max(0, input_data.idle_duration_daily - excessive_idle_threshold)
+    is_excessive, excess_time = _excessive_idle(input_data.idle_duration_daily, threshold)
     
     details = {
-        'idle_duration_daily': float(input_data.idle_duration_daily),
-        'threshold': float(excessive_idle_threshold),
-        'excess_time': float(excess_time),
-        'is_excessive': bool(is_excessive)
+        'idle_duration_daily': input_data.idle_duration_daily,
+        'threshold': threshold,
+        'excess_time': excess_time,
+        'is_excessive': is_excessive
     }
     
     reason = ""
@@ -157,6 +257,36 @@ def detect_excessive_idle(input_data: ExcessiveIdleDetectionInput) -> Tuple[bool
     return is_excessive, {'details': details, 'reason': reason}
 
 
+def detect_excessive_idle_batch(inputs: List[ExcessiveIdleDetectionInput]) -> ExcessiveIdleBatchOutput:
+    """
+    Versi batch dari detect_excessive_idle untuk banyak device (mis. laporan harian armada)
+    
+    Threshold dibaca sekali dan rule dievaluasi sebagai operasi numpy atas semua device,
+    bukan satu call detect_excessive_idle per device.
+    """
+    params = get_anomaly_params()
+    threshold = float(params.get('excessive_idle_threshold', DEFAULT_THRESHOLDS['excessive_idle_threshold']))
+    
+    idle = np.fromiter((item.idle_duration_daily for item in inputs), dtype=np.float64, count=len(inputs))
+    is_excessive = idle > threshold
+    excess_time = np.maximum(idle - threshold, 0.0)
+    
+    results = [
+        ExcessiveIdleDetectionOutput(
+            is_excessive_idle=flag,
+            idle_duration_daily=value,
+            threshold=threshold,
+            excess_time=excess
+        )
+        for flag, value, excess in zip(is_excessive.tolist(), idle.tolist(), excess_time.tolist())
+    ]
+    return ExcessiveIdleBatchOutput(
+        total_devices=len(results),
+        excessive_count=int(is_excessive.sum()),
+        results=results
+    )
+
+
 def detect_emission_inefficiency(input_data: EmissionInefficientDetectionInput,
                                  co2_mean: float = None,
                                  co2_std: float = None) -> Tuple[bool, Dict[str, Any]]:
@@ -167,93 +297,171 @@ def detect_emission_inefficiency(input_data: EmissionInefficientDetectionInput,
     """
     # Use provided or estimate from input
     if co2_mean is None:
-        co2_mean = input_data.co2_intensity_mean or 150.0  # Default estimate
+        co2_mean = input_data.co2_intensity_mean or DEFAULT_CO2_INTENSITY_MEAN  # Default estimate
     if co2_std is None:
-        co2_std = input_data.co2_intensity_std or 50.0  # Default estimate
-    
-    threshold = co2_mean + (2 * co2_std)
-    is_inefficient = input_data.co2_intensity > threshold
-    
-    # Calculate deviation in terms of std dev
-    deviation = (input_data.co2_intensity - co2_mean) / co2_std if co2_std > 0 else 0
-    
-    # Approximate percentile (using z-score to percentile conversion)
-    from scipy import stats
-    try:
-        percentile = stats.norm.cdf(deviation) * 100
-    except:
-        percentile = 50.0
+        co2_std = input_data.co2_intensity_std or DEFAULT_CO2_INTENSITY_STD  # Default estimate
     
+    return _emission_inefficiency_result(input_data.co2_intensity, co2_mean, co2_std)
+
+
+def _emission_inefficiency_result(co2_intensity: float,
+                                  co2_mean: float = DEFAULT_CO2_INTENSITY_MEAN,
+                                  co2_std: float = DEFAULT_CO2_INTENSITY_STD) -> Tuple[bool, Dict[str, Any]]:
+    """Evaluasi rule emission inefficiency dari nilai yang sudah tervalidasi (tanpa membangun schema input)"""
+    co2_intensity = float(co2_intensity)
+    co2_mean = float(co2_mean)
+    co2_std = float(co2_std)
+    return _emission_inefficiency_output(
+        co2_intensity, co2_mean, co2_std,
+        *_emission_inefficiency(co2_intensity, co2_mean, co2_std)
+    )
+
+
+def _emission_inefficiency_output(co2_intensity: float, co2_mean: float, co2_std: float,
+                                  is_inefficient: bool, threshold: float, deviation: float,
+                                  percentile: float) -> Tuple[bool, Dict[str, Any]]:
+    """Susun hasil rule emission inefficiency (details + reason) dari output kernel"""
     details = {
-        'co2_intensity': float(input_data.co2_intensity),
-        'threshold': float(threshold),
-        'mean': float(co2_mean),
-        'std': float(co2_std),
-        'deviation': float(deviation),
-        'percentile': float(percentile)
+        'co2_intensity': co2_intensity,
+        'threshold': threshold,
+        'mean': co2_mean,
+        'std': co2_std,
+        'deviation': deviation,
+        'percentile': percentile
     }
     
     reason = ""
     if is_inefficient:
-        reason = f"Inefficient emission detected: CO2 intensity {input_data.co2_intensity:.2f} > threshold {threshold:.2f}"
+        reason = f"Inefficient emission detected: CO2 intensity {co2_intensity:.2f} > threshold {threshold:.2f}"
     else:
-        reason = f"Normal emission level: CO2 intensity {input_data.co2_intensity:.2f}"
+        reason = f"Normal emission level: CO2 intensity {co2_intensity:.2f}"
     
     return is_inefficient, {'details': details, 'reason': reason}
 
 
-def predict_ml_anomaly(input_data: AnomalyDetectionInput) -> Tuple[float, bool]:
+def _fill_features(row: np.ndarray, input_data: AnomalyDetectionInput) -> None:
+    """Tulis features satu input ke row (urutan ML_FEATURES)"""
+    row[:] = _get_features(input_data)
+
+
+def _build_features(inputs: List[AnomalyDetectionInput]) -> np.ndarray:
+    """Susun matrix features float32 (N, 8) sesuai urutan ML_FEATURES"""
+    return np.array(
+        [_get_features(input_data) for input_data in inputs], dtype=np.float32
+    ).reshape(len(inputs), len(ML_FEATURES))
+
+
+def _get_iforest_model():
     """
-    Prediksi anomali menggunakan Isolation Forest model
+    Ambil Isolation Forest yang menerima fitur mentah (tanpa scaler) sekali per proses
+
+    StandardScaler hanya (x - mean) / scale dengan scale > 0, sehingga split
+    (x - mean) / scale <= t setara dengan x <= t * scale + mean. Threshold setiap
+    node di-transform sekali di sini dan prediksi tidak perlu scaling per call.
+    Model di-copy agar objek di _models_cache tetap model asli.
+    """
+    global _iforest_model
+    if _iforest_model is None:
+        model_if = copy.deepcopy(load_model('model_isolation_forest.pkl'))
+        scaler = load_model('scaler_anomaly_detection.pkl')
+        n_features = len(ML_FEATURES)
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+        for estimator, estimator_features in zip(model_if.estimators_, model_if.estimators_features_):
+            tree = estimator.tree_
+            # threshold adalah view ke array node tree, jadi update in-place mengubah model
+            threshold = tree.threshold
+            split = tree.feature >= 0
+            column = np.asarray(estimator_features)[tree.feature[split]]
+            threshold[split] = threshold[split] * scale[column] + mean[column]
+        _iforest_model = model_if
+    return _iforest_model
+
+
+def get_onnx_session():
+    """
+    Load InferenceSession ONNX sekali per proses
     
     Returns:
-        anomaly_score: Score dari -1 (pasti anomali) hingga 1 (pasti normal)
-        is_anomaly: Boolean flag berdasarkan score threshold
+        Tuple (session, offset) atau None jika onnxruntime/model tidak tersedia
+    """
+    global _onnx_session
+    if _onnx_session is None:
+        _onnx_session = False
+        filepath = os.path.join(MODEL_DIR, ONNX_MODEL_FILENAME)
+        if HAS_ONNXRUNTIME and os.path.exists(filepath):
+            try:
+                sess_options = ort.SessionOptions()
+                sess_options.intra_op_num_threads = ORT_INTRA_OP_THREADS
+                session = ort.InferenceSession(
+                    filepath,
+                    sess_options=sess_options,
+                    providers=["CPUExecutionProvider"]
+                )
+                offset = float(session.get_modelmeta().custom_metadata_map['offset'])
+                _onnx_session = (session, offset)
+            except Exception as e:
+                logger.warning(f"Failed to load ONNX model, falling back to sklearn: {e}")
+    return _onnx_session or None
+
+
+def _score_samples(model_if, features: np.ndarray) -> np.ndarray:
+    """
+    model_if.score_samples, diparalelkan antar tree untuk batch besar
+
+    sklearn menjalankan traversal tree sekuensial (n_jobs model tidak dipakai di sini);
+    traversal Cython melepas GIL sehingga backend threading bisa memakai beberapa core.
+    """
+    if HAS_JOBLIB and ORT_INTRA_OP_THREADS > 1 and len(features) >= IFOREST_PARALLEL_MIN_SAMPLES:
+        with joblib.parallel_config(backend='threading', n_jobs=ORT_INTRA_OP_THREADS):
+            return model_if.score_samples(features)
+    return model_if.score_samples(features)
+
+
+def predict_ml_anomaly_batch(features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Prediksi anomali untuk banyak sampel sekaligus (satu kali Isolation Forest)
+    
+    Args:
+        features: Array (N, 8) dengan urutan kolom ML_FEATURES
+    
+    Returns:
+        anomaly_scores: Array (N,) score dari Isolation Forest
+        is_anomaly: Array boolean (N,) berdasarkan prediksi model
     """
     try:
-        # Load model dan scaler
-        model_if = load_model('model_isolation_forest.pkl')
-        scaler = load_model('scaler_anomaly_detection.pkl')
-        
-        # Feature list sesuai urutan saat training
-        feature_cols = [
-            'speed',
-            'distance_delta',
-            'fuel_delta',
-            'fuel_consumption_rate',
-            'idle_duration',
-            'rpm',
-            'engine_load',
-            'co2_intensity'
-        ]
+        onnx = get_onnx_session()
+        if onnx is not None:
+            session, offset = onnx
+            # Graph ONNX sudah termasuk scaler; output 'scores' = score_samples - offset_
+            labels, scores = session.run(None, {"X": np.asarray(features, dtype=np.float32)})
+            return scores.ravel().astype(np.float64) + offset, labels.ravel() == -1
         
-        # Ekstrak features dari input data
-        features = np.array([[
-            input_data.speed,
-            input_data.distance_delta,
-            input_data.fuel_delta,
-            input_data.fuel_consumption_rate,
-            input_data.idle_duration,
-            input_data.rpm,
-            input_data.engine_load,
-            input_data.co2_intensity
-        ]])
-        
-        # Scale features
-        features_scaled = scaler.transform(features)
+        # Scaler sudah dilebur ke threshold tree, fitur mentah langsung di-score
+        model_if = _get_iforest_model()
         
         # Get anomaly score (-1 untuk anomali, 1 untuk normal)
-        anomaly_score = model_if.score_samples(features_scaled)[0]
-        
-        # Get prediction (-1 untuk anomali, 1 untuk normal)
-        prediction = model_if.predict(features_scaled)[0]
-        is_anomaly_ml = prediction == -1
+        anomaly_scores = _score_samples(model_if, features)
         
-        return anomaly_score, is_anomaly_ml
+        # Prediksi diturunkan dari score (sama dengan model_if.predict == -1, yaitu
+        # decision_function < 0) tanpa traversal tree kedua
+        return anomaly_scores, (anomaly_scores - model_if.offset_) < 0
     
     except Exception as e:
         # Jika model tidak bisa di-load, return neutral score
-        return 0.0, False
+        return np.zeros(len(features)), np.zeros(len(features), dtype=bool)
+
+
+def predict_ml_anomaly(input_data: AnomalyDetectionInput) -> Tuple[float, bool]:
+    """
+    Prediksi anomali menggunakan Isolation Forest model
+    
+    Returns:
+        anomaly_score: Score dari -1 (pasti anomali) hingga 1 (pasti normal)
+        is_anomaly: Boolean flag berdasarkan score threshold
+    """
+    anomaly_scores, is_anomaly_ml = predict_ml_anomaly_batch(_build_features([input_data]))
+    return anomaly_scores[0].item(), is_anomaly_ml[0].item()
 
 
 def calculate_severity(anomaly_types: List[str], anomaly_score: float, confidence: float) -> Tuple[SeverityLevel, float]:
@@ -263,17 +471,20 @@ def calculate_severity(anomaly_types: List[str], anomaly_score: float, confidenc
     if not anomaly_types:
         return SeverityLevel.LOW, 0.0
     
-    # Base severity based on anomaly types
-    severity_map = {
-        'fuel_theft': 0.95,          # CRITICAL
-        'ml_detected': 0.7,          # HIGH
-        'excessive_idle': 0.5,       # MEDIUM
-        'emission_inefficient': 0.4  # LOW to MEDIUM
-    }
-    
     # Get max severity from detected anomalies
-    max_severity_score = max([severity_map.get(t, 0.3) for t in anomaly_types])
-    
+    max_severity_score = max([ANOMALY_TYPE_SEVERITY.get(t, 0.3) for t in anomaly_types])
+    return _severity_level(max_severity_score, anomaly_score, confidence)
+
+
+def _severity_from_mask(type_mask: int, anomaly_score: float, confidence: float) -> Tuple[SeverityLevel, float]:
+    """calculate_severity untuk kombinasi type dalam bentuk bitmask ANOMALY_TYPE_BITS"""
+    if not type_mask:
+        return SeverityLevel.LOW, 0.0
+    return _severity_level(_MAX_TYPE_SEVERITY[type_mask], anomaly_score, confidence)
+
+
+def _severity_level(max_severity_score: float, anomaly_score: float, confidence: float) -> Tuple[SeverityLevel, float]:
+    """Sesuaikan base severity dengan anomaly score lalu petakan ke SeverityLevel"""
     # Adjust by anomaly score (more negative = more anomalous)
     if anomaly_score < -0.5:
         max_severity_score = min(1.0, max_severity_score + 0.2)
@@ -291,68 +502,185 @@ def calculate_severity(anomaly_types: List[str], anomaly_score: float, confidenc
     return severity, min(1.0, max_severity_score * confidence)
 
 
-def predict_anomaly(input_data: AnomalyDetectionInput) -> AnomalyDetectionOutput:
+def _detect_fuel_theft(input_data: AnomalyDetectionInput) -> Tuple[bool, Dict[str, Any]]:
     """
-    Main function untuk prediksi anomali menggunakan kombinasi rule-based dan ML approaches
+    Fuel theft check untuk AnomalyDetectionInput
+
+    Field speed/distance_delta/fuel_delta sudah divalidasi dengan constraint yang sama
+    seperti FuelTheftDetectionInput, jadi schema itu tidak perlu dibangun ulang per record.
     """
-    try:
-        anomaly_types = []
-        details = {}
-        
-        # 1. Fuel Theft Detection
-        fuel_theft_input = FuelTheftDetectionInput(
-            speed=input_data.speed,
-            distance_delta=input_data.distance_delta,
-            fuel_delta=input_data.fuel_delta
-        )
-        is_fuel_theft, fuel_theft_details = detect_fuel_theft(fuel_theft_input)
-        if is_fuel_theft:
-            anomaly_types.append('fuel_theft')
-        details['fuel_theft'] = fuel_theft_details
-        
-        # 2. ML-Based Anomaly Detection
-        anomaly_score, is_anomaly_ml = predict_ml_anomaly(input_data)
+    return _fuel_theft_result(input_data.speed, input_data.distance_delta, input_data.fuel_delta)
+
+
+def _detect_rules_batch(inputs: List[AnomalyDetectionInput]) -> Tuple[List[Tuple[bool, Dict[str, Any]]],
+                                                                      List[Tuple[bool, Dict[str, Any]]]]:
+    """
+    Rule fuel theft + emission inefficiency untuk semua input dengan satu kernel array
+
+    Returns:
+        (fuel_thefts, emission_inefficiencies): list hasil per input, format sama dengan
+        _fuel_theft_result / _emission_inefficiency_result
+    """
+    params = get_anomaly_params()
+    fuel_theft_threshold = float(params.get('fuel_theft_threshold', DEFAULT_THRESHOLDS['fuel_theft_threshold']))
+    
+    columns = np.array([_get_rule_inputs(input_data) for input_data in inputs], dtype=np.float64)
+    speed, distance_delta, fuel_delta, co2_intensity = np.ascontiguousarray(columns.reshape(len(inputs), 4).T)
+    (is_fuel_theft, large_fuel_drop, vehicle_stationary, no_movement, risk_score,
+     is_inefficient, threshold, deviation) = _rules_batch(
+        speed, distance_delta, fuel_delta, co2_intensity, fuel_theft_threshold,
+        DEFAULT_CO2_INTENSITY_MEAN, DEFAULT_CO2_INTENSITY_STD
+    )
+    
+    fuel_thefts = [
+        _fuel_theft_output(*row)
+        for row in zip(speed.tolist(), distance_delta.tolist(), fuel_delta.tolist(),
+                       is_fuel_theft.tolist(), large_fuel_drop.tolist(), vehicle_stationary.tolist(),
+                       no_movement.tolist(), risk_score.tolist())
+    ]
+    threshold = float(threshold)
+    emissions = [
+        _emission_inefficiency_output(co2, DEFAULT_CO2_INTENSITY_MEAN, DEFAULT_CO2_INTENSITY_STD,
+                                      inefficient, threshold, dev, _normal_percentile(dev))
+        for co2, inefficient, dev in zip(co2_intensity.tolist(), is_inefficient.tolist(), deviation.tolist())
+    ]
+    return fuel_thefts, emissions
+
+
+def _build_anomaly_output(input_data: AnomalyDetectionInput,
+                          anomaly_score: float,
+                          is_anomaly_ml: bool,
+                          fuel_theft: Tuple[bool, Dict[str, Any]] = None,
+                          ml_skipped: bool = False,
+                          emission_inefficiency: Tuple[bool, Dict[str, Any]] = None) -> AnomalyDetectionOutput:
+    """Gabungkan hasil ML dengan rule-based detectors menjadi AnomalyDetectionOutput"""
+    anomaly_types = []
+    type_mask = 0
+    details = {}
+    
+    # 1. Fuel Theft Detection
+    if fuel_theft is None:
+        fuel_theft = _detect_fuel_theft(input_data)
+    is_fuel_theft, fuel_theft_details = fuel_theft
+    if is_fuel_theft:
+        anomaly_types.append('fuel_theft')
+        type_mask |= _FUEL_THEFT_BIT
+    details['fuel_theft'] = fuel_theft_details
+    
+    # 2. ML-Based Anomaly Detection
+    if ml_skipped:
+        # Fuel theft sudah pasti CRITICAL, Isolation Forest tidak dijalankan
+        details['ml_anomaly'] = {
+            'anomaly_score': anomaly_score,
+            'is_anomaly_ml': None,
+            'skipped': True
+        }
+    else:
         if is_anomaly_ml:
             anomaly_types.append('ml_detected')
+            type_mask |= _ML_DETECTED_BIT
         details['ml_anomaly'] = {
-            'anomaly_score': float(anomaly_score),
-            'is_anomaly_ml': bool(is_anomaly_ml)
+            'anomaly_score': anomaly_score,
+            'is_anomaly_ml': is_anomaly_ml
         }
+    
+    # 3. Emission Inefficiency Detection (estimasi default mean/std populasi)
+    if emission_inefficiency is None:
+        emission_inefficiency = _emission_inefficiency_result(input_data.co2_intensity)
+    is_inefficient, emission_details = emission_inefficiency
+    if is_inefficient:
+        anomaly_types.append('emission_inefficient')
+        type_mask |= _EMISSION_INEFFICIENT_BIT
+    details['emission_inefficiency'] = emission_details
+    
+    # Calculate overall anomaly and confidence
+    is_anomaly = len(anomaly_types) > 0
+    
+    # Confidence calculation based on number of detections
+    confidence = min(1.0, len(anomaly_types) / 3.0)  # Max 3 detection methods
+    if anomaly_score < -0.3:
+        confidence = min(1.0, confidence + 0.3)
+    confidence = max(0.3, confidence)  # Minimum confidence 0.3
+    
+    # Calculate severity
+    severity, severity_score = _severity_from_mask(type_mask, anomaly_score, confidence)
+    
+    return AnomalyDetectionOutput(
+        is_anomaly=is_anomaly,
+        anomaly_score=round(anomaly_score, 4),
+        anomaly_types=anomaly_types,
+        severity=severity,
+        details=details,
+        confidence=round(confidence, 2)
+    )
+
+
+def predict_anomaly(input_data: AnomalyDetectionInput) -> AnomalyDetectionOutput:
+    """
+    Main function untuk prediksi anomali menggunakan kombinasi rule-based dan ML approaches
+    """
+    return predict_anomaly_batch([input_data])[0]
+
+
+def predict_anomaly_batch(inputs: List[AnomalyDetectionInput],
+                          features: np.ndarray = None) -> List[AnomalyDetectionOutput]:
+    """
+    Versi batch dari predict_anomaly: Isolation Forest dijalankan sekali untuk semua input
+    
+    Rule fuel theft dievaluasi lebih dulu; dengan ANOMALY_SHORT_CIRCUIT=true (opt-in), input yang
+    sudah pasti CRITICAL karena fuel theft tidak ikut di-score Isolation Forest.
+    
+    Args:
+        inputs: List AnomalyDetectionInput
+        features: Optional matrix (N, 8) yang sudah diisi dari inputs (mis. buffer batcher)
+    """
+    try:
+        fuel_thefts, emission_inefficiencies = _detect_rules_batch(inputs)
+        if ANOMALY_SHORT_CIRCUIT:
+            needs_ml = np.fromiter((not is_fuel_theft for is_fuel_theft, _ in fuel_thefts),
+                                   dtype=bool, count=len(inputs))
+        else:
+            needs_ml = np.ones(len(inputs), dtype=bool)
         
-        # 3. Emission Inefficiency Detection
-        emission_inefficient_input = EmissionInefficientDetectionInput(
-            co2_intensity=input_data.co2_intensity
-        )
-        is_inefficient, emission_details = detect_emission_inefficiency(emission_inefficient_input)
-        if is_inefficient:
-            anomaly_types.append('emission_inefficient')
-        details['emission_inefficiency'] = emission_details
-        
-        # Calculate overall anomaly and confidence
-        is_anomaly = len(anomaly_types) > 0
-        
-        # Confidence calculation based on number of detections
-        confidence = min(1.0, len(anomaly_types) / 3.0)  # Max 3 detection methods
-        if anomaly_score < -0.3:
-            confidence = min(1.0, confidence + 0.3)
-        confidence = max(0.3, confidence)  # Minimum confidence 0.3
-        
-        # Calculate severity
-        severity, severity_score = calculate_severity(anomaly_types, anomaly_score, confidence)
+        anomaly_scores = np.full(len(inputs), SHORT_CIRCUIT_ANOMALY_SCORE)
+        is_anomaly_ml = np.zeros(len(inputs), dtype=bool)
+        if needs_ml.any():
+            if features is None:
+                features = _build_features(inputs)
+            if not needs_ml.all():
+                features = features[needs_ml]
+            anomaly_scores[needs_ml], is_anomaly_ml[needs_ml] = predict_ml_anomaly_batch(features)
         
-        return AnomalyDetectionOutput(
-            is_anomaly=is_anomaly,
-            anomaly_score=round(anomaly_score, 4),
-            anomaly_types=anomaly_types,
-            severity=severity,
-            details=details,
-            confidence=round(confidence, 2)
-        )
+        # Konversi ke float/bool Python sekali per batch (bukan numpy scalar per item)
+        return [
+            _build_anomaly_output(input_data, anomaly_score, is_anomaly,
+                                  fuel_theft=fuel_theft, ml_skipped=not run_ml,
+                                  emission_inefficiency=emission_inefficiency)
+            for input_data, anomaly_score, is_anomaly, fuel_theft, run_ml, emission_inefficiency in zip(
+                inputs, anomaly_scores.tolist(), is_anomaly_ml.tolist(), fuel_thefts, needs_ml.tolist(),
+                emission_inefficiencies
+            )
+        ]
     
     except Exception as e:
         raise Exception(f"Anomaly prediction error: {str(e)}")
 
 
+class AnomalyBatcher(AsyncBatcher):
+    """Dynamic batcher untuk endpoint /anomaly/detect"""
+
+    n_features = len(ML_FEATURES)
+
+    def fill_row(self, row: np.ndarray, item: AnomalyDetectionInput) -> None:
+        _fill_features(row, item)
+
+    def process_batch(self, items: List[AnomalyDetectionInput], features: np.ndarray) -> List[AnomalyDetectionOutput]:
+        return predict_anomaly_batch(items, features)
+
+
+anomaly_batcher = AnomalyBatcher()
+
+
 def get_anomaly_model_info() -> Dict[str, Any]:
     """Get model information"""
     try:
@@ -360,10 +688,7 @@ def get_anomaly_model_info() -> Dict[str, Any]:
         return {
             "status": "success",
             "parameters": params,
-            "features": [
-                'speed', 'distance_delta', 'fuel_delta', 'fuel_consumption_rate',
-                'idle_duration', 'rpm', 'engine_load', 'co2_intensity'
-            ],
+            "features": ML_FEATURES,
             "anomaly_types": ['fuel_theft', 'ml_detected', 'emission_inefficient'],
             "severity_levels": [s.value for s in SeverityLevel]
         }
@@ -1,17 +1,27 @@
+import hashlib
 import httpx
 import logging
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status
+from app.core.http import get_http_client, get_upstream_limit
+from app.core.responses import load_json
+from app.core.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 TRANSTRACK_LOGIN_URL = "https://telematics.transtrack.id/api/login"
 TRANSTRACK_LANG = "en"
 
+# Login identik (email + password sama) yang sedang berjalan digabung menjadi satu request
+_login_flight = SingleFlight()
+
 
 async def login_with_transtrack(email: str, password: str) -> Dict[str, Any]:
     """
     Login menggunakan API Transtrack third-party.
+
+    Login paralel dengan kredensial yang sama (mis. retry storm dari client) hanya
+    mengirim satu request ke Transtrack; semua caller menerima hasil/error yang sama.
     
     Args:
         email: Email pengguna
@@ -23,40 +33,48 @@ async def login_with_transtrack(email: str, password: str) -> Dict[str, Any]:
     Raises:
         HTTPException: Jika login gagal
     """
+    # Key di-hash supaya password tidak disimpan plaintext sebagai key dict
+    key = hashlib.sha256(f"{email}\0{password}".encode()).hexdigest()
+    return await _login_flight.do(key, _login_with_transtrack, email, password)
+
+
+async def _login_with_transtrack(email: str, password: str) -> Dict[str, Any]:
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            payload = {
-                "email": email,
-                "password": password
-            }
-            
-            params = {
-                "lang": TRANSTRACK_LANG
-            }
-            
+        client = get_http_client()
+        payload = {
+            "email": email,
+            "password": password
+        }
+        
+        params = {
+            "lang": TRANSTRACK_LANG
+        }
+        
+        async with get_upstream_limit():
             response = await client.post(
                 TRANSTRACK_LOGIN_URL,
                 json=payload,
                 params=params
             )
-            
-            response_data = response.json()
-            
-            # Check response status - success jika status code 200
-            if response.status_code == 200:
-                logger.info(f"Login successful untuk email: {email}")
-                return response_data
-            else:
-                # Handle error response dari API
-                error_msg = response_data.get("message", "Login gagal")
-                logger.warning(
-                    f"Login failed with status {response.status_code}: {error_msg}"
-                )
-                raise HTTPException(
-                    status_code=response.status_code if response.status_code >= 400 else status.HTTP_401_UNAUTHORIZED,
-                    detail=error_msg
-                )
-            
+        
+        # Parse langsung dari bytes dengan orjson (lebih cepat dari response.json())
+        response_data = load_json(response.content)
+        
+        # Check response status - success jika status code 200
+        if response.status_code == 200:
+            logger.info(f"Login successful untuk email: {email}")
+            return response_data
+        else:
+            # Handle error response dari API
+            error_msg = response_data.get("message", "Login gagal")
+            logger.warning(
+                f"Login failed with status {response.status_code}: {error_msg}"
+            )
+            raise HTTPException(
+                status_code=response.status_code if response.status_code >= 400 else status.HTTP_401_UNAUTHORIZED,
+                detail=error_msg
+            )
+        
     except HTTPException:
         # Re-raise HTTPException yang sudah dibuat
         raise
@@ -86,23 +104,23 @@ async def verify_token(token: str) -> Optional[Dict[str, Any]]:
         User data jika token valid, None jika tidak valid
     """
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            headers = {
-                "Authorization": f"Bearer {token}"
-            }
-            
-            # Endpoint untuk verify token bisa disesuaikan
-            # sesuai dengan dokumentasi Transtrack API
-            response = await client.get(
-                f"{TRANSTRACK_LOGIN_URL}/verify",
-                headers=headers
-            )
+        client = get_http_client()
+        headers = {
+            "Authorization": f"Bearer {token}"
+        }
+        
+        # Endpoint untuk verify token bisa disesuaikan
+        # sesuai dengan dokumentasi Transtrack API
+        response = await client.get(
+            f"{TRANSTRACK_LOGIN_URL}/verify",
+            headers=headers
+        )
+        
+        if response.status_code == 200:
+            return load_json(response.content)
+        else:
+            return None
             
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return None
-                
     except Exception as e:
         logger.error(f"Error verifying token: {str(e)}")
         return None
@@ -1,7 +1,9 @@
 import logging
-from typing import Any, Dict
+import numpy as np
+from typing import Any, Dict, Optional
 from datetime import datetime, timedelta, timezone
 import os
+from app.services._numba_rules import _accumulate_deltas
 
 logger = logging.getLogger(__name__)
 
@@ -14,24 +16,18 @@ DIESEL_EMISSION_FACTOR = 2.68  # kg CO2 per liter solar/diesel
 IDLE_TIME_CRITICAL_MINS = 120  # 2 jam dalam menit
 IDLE_TIME_WARNING_MINS = 30  # 30 menit
 
-
-def _get_date_from_timestamp(timestamp_str: str) -> str:
-    """
-    Extract tanggal dari timestamp string.
-    
-    Args:
-        timestamp_str: Timestamp dalam format "YYYY-MM-DD HH:MM:SS"
-        
-    Returns:
-        Tanggal dalam format "YYYY-MM-DD"
-    """
-    try:
-        if isinstance(timestamp_str, str):
-            # Ambil bagian tanggal (first 10 chars = "YYYY-MM-DD")
-            return timestamp_str[:10]
-        return None
-    except Exception:
-        return None
+# Status Transtrack yang membuka / menutup periode idle
+IDLE_STATUSES = frozenset(("Idle", "Start"))
+MOVING_STATUSES = frozenset(("Drive", "End"))
+# Kode event per status untuk _idle_periods (status lain = 0, tidak mengubah periode idle)
+_IDLE_EVENT = 1
+_MOVING_EVENT = 2
+_STATUS_EVENTS = {
+    **{status: _IDLE_EVENT for status in IDLE_STATUSES},
+    **{status: _MOVING_EVENT for status in MOVING_STATUSES},
+}
+# Sort key untuk record tanpa timestamp valid (aware, sebanding dengan hasil _parse_timestamp)
+_MIN_TIMESTAMP = datetime.min.replace(tzinfo=timezone.utc)
 
 
 def _filter_history_by_date(history_data: list[dict], target_date: str = None) -> list[dict]:
@@ -50,18 +46,85 @@ def _filter_history_by_date(history_data: list[dict], target_date: str = None) -
         # Use UTC timezone explicitly - this ensures consistency between dev and prod
         target_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     
-    filtered_data = []
-    for item in history_data:
-        timestamp = item.get("timestamp")
-        if timestamp:
-            item_date = _get_date_from_timestamp(timestamp)
-            if item_date == target_date:
-                filtered_data.append(item)
-    
-    return filtered_data
+    # Tanggal = 10 karakter pertama timestamp ("YYYY-MM-DD"), dibandingkan inline per record
+    return [
+        item for item in history_data
+        if (timestamp := item.get("timestamp")) and isinstance(timestamp, str)
+        and timestamp[:10] == target_date
+    ]
+
 
+def _parse_timestamp(timestamp: Any) -> Optional[datetime]:
+    """
+    Parse timestamp "YYYY-MM-DD HH:MM:SS" sebagai UTC (aware); None jika kosong / tidak valid.
+
+    Timestamp Transtrack diperlakukan sebagai UTC, sama dengan filter tanggal di atas,
+    sehingga bisa dikurangkan langsung dengan `now` (UTC aware).
 
-def calculate_dashboard_metrics(history_data: list[dict]) -> Dict[str, Any]:
+    Bentuk standar di-parse dengan datetime.fromisoformat (C, jauh lebih cepat dari
+    strptime); bentuk lain tetap lewat strptime agar hasilnya sama seperti sebelumnya.
+    """
+    if not timestamp:
+        return None
+    if (isinstance(timestamp, str) and len(timestamp) == 19
+            and timestamp[10] == " " and timestamp[13] == ":" and timestamp[16] == ":"):
+        try:
+            return datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    try:
+        return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    except Exception:
+        return None
+
+
+def _idle_periods(statuses: list, timestamps: list[Optional[datetime]]) -> tuple[float, Optional[datetime]]:
+    """
+    Akumulasi periode idle dari history terurut: periode dibuka record Idle/Start
+    pertama dan ditutup record Drive/End berikutnya.
+
+    Tepi periode dicari dengan mask numpy, sehingga loop Python hanya berjalan per
+    periode idle, bukan per record. Record idle tanpa timestamp valid tidak membuka
+    periode; record moving tanpa timestamp valid menutup periode tanpa menambah durasi.
+
+    Returns:
+        (total_idle_minutes, start periode idle yang belum ditutup atau None)
+    """
+    n = len(statuses)
+    events = np.fromiter((_STATUS_EVENTS.get(status, 0) for status in statuses), dtype=np.int8, count=n)
+    has_timestamp = np.fromiter((ts is not None for ts in timestamps), dtype=bool, count=n)
+    events[(events == _IDLE_EVENT) & ~has_timestamp] = 0
+
+    event_index = np.flatnonzero(events)
+    event_is_idle = events[event_index] == _IDLE_EVENT
+    prev_is_idle = np.concatenate(([False], event_is_idle[:-1]))
+    starts = event_index[event_is_idle & ~prev_is_idle].tolist()
+    ends = event_index[~event_is_idle & prev_is_idle].tolist()
+
+    total_idle_minutes = 0.0
+    for start, end in zip(starts, ends):
+        if timestamps[end] is not None:
+            diff = timestamps[end] - timestamps[start]
+            total_idle_minutes += max(0.0, diff.total_seconds() / 60)
+
+    open_start = timestamps[starts[-1]] if len(starts) > len(ends) else None
+    return total_idle_minutes, open_start
+
+
+def _numeric_column(records: list[dict], key: str) -> np.ndarray:
+    """
+    Ambil field numerik dari records sebagai array float64 (urutan dipertahankan).
+
+    Nilai non-numerik (None, string) dilewati, sehingga np.diff pada hasilnya sama dengan
+    selisih terhadap nilai numerik terakhir sebelumnya.
+    """
+    return np.fromiter(
+        (v for v in (item.get(key) for item in records) if isinstance(v, (int, float))),
+        dtype=np.float64,
+    )
+
+
+def calculate_dashboard_metrics(history_data: list[dict], now: Optional[datetime] = None) -> Dict[str, Any]:
     """
     Menghitung metrik dashboard dari processed history data.
     Uses UTC timezone for consistency between development and production.
@@ -69,13 +132,19 @@ def calculate_dashboard_metrics(history_data: list[dict]) -> Dict[str, Any]:
     Args:
         history_data: List dari process_history_data dengan fields: fuel_level_l, odometer_km,
                       engine_idle, status, timestamp, dll
+        now: Waktu request (UTC aware, naive dianggap UTC); default datetime.now(timezone.utc)
 
     Returns:
         Dict dengan metrics: total_emissions_kg, emission_intensity_gco2_km,
         idle_time_hours, status_color, summary
     """
+    if now is None:
+        now = datetime.now(timezone.utc)
+    elif now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+
     # Filter data hanya untuk hari ini (UTC for consistency)
-    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    today = now.strftime("%Y-%m-%d")
     history_data = _filter_history_by_date(history_data, target_date=today)
     
     if not history_data:
@@ -92,95 +161,43 @@ def calculate_dashboard_metrics(history_data: list[dict]) -> Dict[str, Any]:
             },
         }
 
+    # Sort history by timestamp ascending to compute deltas correctly.
+    # Timestamp di-parse sekali per record dan dipakai ulang untuk tracking idle di bawah
+    parsed_timestamps = [_parse_timestamp(item.get("timestamp")) for item in history_data]
+    sort_keys = [parsed or _MIN_TIMESTAMP for parsed in parsed_timestamps]
+    if all(prev <= curr for prev, curr in zip(sort_keys, sort_keys[1:])):
+        # History Transtrack biasanya sudah urut; sort stabil tidak akan mengubah urutan
+        sorted_history = history_data
+        sorted_timestamps = parsed_timestamps
+    else:
+        order = sorted(range(len(history_data)), key=sort_keys.__getitem__)
+        sorted_history = [history_data[i] for i in order]
+        sorted_timestamps = [parsed_timestamps[i] for i in order]
+
     # Kalkulasi total fuel consumed dan total distance menggunakan delta (perubahan dari record sebelumnya)
-    total_fuel_consumed_l = 0.0
-    total_distance_km = 0.0
-    total_idle_minutes = 0.0
-    has_theft_alert = False
-    last_timestamp = None
-    current_status = None
-
-    # Track previous values untuk menghitung delta
-    prev_fuel_level_l = None
-    prev_odometer_km = None
-
-    # Sort history by timestamp ascending to compute deltas correctly
-    def _parse_ts(item):
-        ts = item.get("timestamp")
-        if not ts:
-            return datetime.min
-        try:
-            return datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
-        except Exception:
-            return datetime.min
+    # Fuel consumption = previous_level - current_level (positif = consumption, tidak refuel);
+    # filter outliers: fuel < 100 L dan distance < 200 km per record
+    total_fuel_consumed_l, total_distance_km = _accumulate_deltas(
+        _numeric_column(sorted_history, "fuel_level_l"),
+        _numeric_column(sorted_history, "odometer_km"),
+    )
+
+    # Record hasil filter selalu punya timestamp, jadi timestamp & status terakhir = record terakhir
+    statuses = [item.get("status") for item in sorted_history]
+    last_timestamp = sorted_history[-1].get("timestamp")
+    current_status = statuses[-1]
 
-    sorted_history = sorted(history_data, key=_parse_ts)
+    # Check for theft alert
+    has_theft_alert = "Theft" in statuses
 
     # For idle accumulation across multiple idle periods
-    idle_period_start = None
-    for item in sorted_history:
-        # Current values
-        current_fuel_level_l = item.get("fuel_level_l")
-        current_odometer_km = item.get("odometer_km")
-
-        # Fuel consumption: Hitung delta (selisih) dari record sebelumnya
-        # Fuel consumption = previous_level - current_level (positif = consumption)
-        if prev_fuel_level_l is not None and isinstance(current_fuel_level_l, (int, float)):
-            fuel_delta = prev_fuel_level_l - current_fuel_level_l
-            # Hanya tambahkan jika positif (actual consumption, tidak refuel)
-            if 0 < fuel_delta < 100:  # Filter outliers
-                total_fuel_consumed_l += fuel_delta
-
-        # Distance: Hitung delta (selisih) dari record sebelumnya
-        if prev_odometer_km is not None and isinstance(current_odometer_km, (int, float)):
-            distance_delta = current_odometer_km - prev_odometer_km
-            # Hanya tambahkan jika positif dan reasonable (< 200 km per record)
-            if 0 < distance_delta < 200:
-                total_distance_km += distance_delta
-
-        # Update previous values untuk iterasi berikutnya
-        if isinstance(current_fuel_level_l, (int, float)):
-            prev_fuel_level_l = current_fuel_level_l
-        if isinstance(current_odometer_km, (int, float)):
-            prev_odometer_km = current_odometer_km
-
-        # Ambil timestamp terakhir dan status
-        timestamp = item.get("timestamp")
-        status = item.get("status")
-        if timestamp:
-            last_timestamp = timestamp
-            current_status = status
-
-        # Check for theft alert
-        if status == "Theft":
-            has_theft_alert = True
-
-        # Track idle periods across the day
-        if status in ["Idle", "Start"]:
-            if idle_period_start is None and timestamp:
-                try:
-                    idle_period_start = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                except Exception:
-                    idle_period_start = None
-        elif status in ["Drive", "End"]:
-            if idle_period_start and timestamp:
-                try:
-                    idle_period_end = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                    diff = idle_period_end - idle_period_start
-                    total_idle_minutes += max(0.0, diff.total_seconds() / 60)
-                except Exception:
-                    pass
-                finally:
-                    idle_period_start = None
-
-    # Jika masih ada idle period yang belum selesai (masih idle sampai sekarang)
+    total_idle_minutes, idle_period_start = _idle_periods(statuses, sorted_timestamps)
+
+    # Jika masih ada idle period yang belum selesai (masih idle sampai sekarang).
+    # Keduanya UTC aware, jadi pengurangan tidak bisa gagal diam-diam
     if idle_period_start:
-        try:
-            current_time = datetime.now(timezone.utc)
-            diff = current_time - idle_period_start
-            total_idle_minutes += max(0.0, diff.total_seconds() / 60)
-        except Exception:
-            pass
+        diff = now - idle_period_start
+        total_idle_minutes += max(0.0, diff.total_seconds() / 60)
 
     # 1. Kalkulasi Total Emisi Harian (kgCO2)
     total_emissions_kg = total_fuel_consumed_l * DIESEL_EMISSION_FACTOR
@@ -231,7 +248,7 @@ def calculate_dashboard_metrics(history_data: list[dict]) -> Dict[str, Any]:
 
 
 def generate_dashboard_summary(
-    device_id: int, metrics: Dict[str, Any], date_range: str = ""
+    device_id: int, metrics: Dict[str, Any], date_range: str = "", now: Optional[datetime] = None
 ) -> Dict[str, Any]:
     """
     Generate dashboard summary dengan informasi lengkap.
@@ -240,6 +257,7 @@ def generate_dashboard_summary(
         device_id: ID kendaraan
         metrics: Dict hasil calculate_dashboard_metrics
         date_range: String untuk menjelaskan tanggal range
+        now: Waktu request (UTC aware); default datetime.now(timezone.utc)
 
     Returns:
         Dashboard summary dict
@@ -247,7 +265,7 @@ def generate_dashboard_summary(
     return {
         "device_id": device_id,
         "date_range": date_range,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": (now or datetime.now(timezone.utc)).isoformat(),
         "metrics": metrics,
         "recommendations": _get_recommendations(metrics),
     }
@@ -1,8 +1,11 @@
 import pickle
+import logging
 import numpy as np
 import os
 import sys
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+from app.core.batching import AsyncBatcher
+from app.core.config import ORT_INTRA_OP_THREADS
 from app.schemas.emission import EmissionPredictionInput, EmissionPredictionOutput
 
 # Try to import joblib as alternative
@@ -12,6 +15,15 @@ try:
 except ImportError:
     HAS_JOBLIB = False
 
+# onnxruntime opsional: fallback ke sklearn jika tidak terpasang
+try:
+    import onnxruntime as ort
+    HAS_ONNXRUNTIME = True
+except ImportError:
+    HAS_ONNXRUNTIME = False
+
+logger = logging.getLogger(__name__)
+
 # Path ke model files
 # Use absolute path to ensure it works in both dev and production (Vercel)
 MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'models', 'emission'))
@@ -19,6 +31,34 @@ MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'model
 # Cache untuk loaded models
 _models_cache = {}
 
+# Graph ONNX scaler + RandomForest per target (lihat app/models/emission_model.py)
+ONNX_MODEL_FILENAMES = ('model_co2_emissions.onnx', 'model_co2_intensity.onnx')
+
+# Session onnxruntime (emissions, intensity) singleton; False = sudah dicoba dan tidak tersedia
+_onnx_sessions = None
+
+# (model_co2_emissions, model_co2_intensity, scaler_co2_emissions, scaler_co2_intensity), lihat _get_models
+_emission_models = None
+
+# True jika scaler emissions dan intensity identik (None = belum dicek), lihat _scalers_shared
+_shared_scaler = None
+
+# Feature list sesuai urutan saat training
+FEATURE_COLUMNS = [
+    'speed_mean',
+    'speed_max',
+    'speed_std',
+    'distance_delta_total',
+    'rpm_mean',
+    'rpm_max',
+    'engine_load_mean',
+    'is_moving_mean',
+    'is_idle_total',
+    'hour',
+    'day_of_week',
+    'is_weekend'
+]
+
 
 def load_model(filename: str):
     """Load model dari pickle file dengan caching dan compatibility handling"""
@@ -60,6 +100,19 @@ def load_model(filename: str):
     return model
 
 
+def warmup() -> None:
+    """
+    Load model dan scaler emisi di startup (lifespan) agar request pertama tidak menanggung
+    unpickle, lalu jalankan satu predict dummy per model (run pertama sklearn lebih lambat)
+    """
+    try:
+        if get_onnx_sessions() is None:
+            _get_models()
+        _predict_features(np.zeros((1, len(FEATURE_COLUMNS)), dtype=np.float64))
+    except Exception as e:
+        logger.warning(f"Emission model warmup failed: {e}")
+
+
 def get_model_info() -> Dict[str, Any]:
     """Get model information"""
     try:
@@ -69,78 +122,191 @@ def get_model_info() -> Dict[str, Any]:
         return {"error": str(e), "status": "Model info not available"}
 
 
-def predict_emission(input_data: EmissionPredictionInput) -> EmissionPredictionOutput:
+def _get_models() -> Tuple[Any, Any, Any, Any]:
     """
-    Prediksi emisi CO2 berdasarkan hourly aggregated features
+    Ambil model dan scaler emisi sebagai satu tuple yang di-cache per proses
+
+    Prediksi cukup membaca satu global, bukan empat load_model (lookup cache per file).
+    """
+    global _emission_models
+    if _emission_models is None:
+        _emission_models = (
+            load_model('model_co2_emissions.pkl'),
+            load_model('model_co2_intensity.pkl'),
+            load_model('scaler_co2_emissions.pkl'),
+            load_model('scaler_co2_intensity.pkl'),
+        )
+    return _emission_models
+
+
+def get_onnx_sessions():
+    """
+    Load InferenceSession ONNX kedua model emisi sekali per proses
+
+    Returns:
+        Tuple (session_co2_emissions, session_co2_intensity) atau None jika
+        onnxruntime/model tidak tersedia
+    """
+    global _onnx_sessions
+    if _onnx_sessions is None:
+        _onnx_sessions = False
+        filepaths = [os.path.join(MODEL_DIR, filename) for filename in ONNX_MODEL_FILENAMES]
+        if HAS_ONNXRUNTIME and all(os.path.exists(filepath) for filepath in filepaths):
+            try:
+                sess_options = ort.SessionOptions()
+                sess_options.intra_op_num_threads = ORT_INTRA_OP_THREADS
+                _onnx_sessions = tuple(
+                    ort.InferenceSession(filepath, sess_options=sess_options, providers=["CPUExecutionProvider"])
+                    for filepath in filepaths
+                )
+            except Exception as e:
+                logger.warning(f"Failed to load emission ONNX models, falling back to sklearn: {e}")
+    return _onnx_sessions or None
+
+
+def _scalers_shared(scaler_co2_emissions, scaler_co2_intensity) -> bool:
+    """
+    Cek sekali per proses apakah kedua scaler menghasilkan transform yang sama persis
+
+    Kedua scaler di-fit dari FEATURE_COLUMNS yang sama; jika parameternya identik,
+    hasil transform scaler emissions dipakai juga untuk model intensity.
+    """
+    global _shared_scaler
+    if _shared_scaler is None:
+        _shared_scaler = (
+            type(scaler_co2_emissions) is type(scaler_co2_intensity)
+            and scaler_co2_emissions.get_params() == scaler_co2_intensity.get_params()
+            and all(
+                np.array_equal(getattr(scaler_co2_emissions, attr), getattr(scaler_co2_intensity, attr))
+                for attr in ('mean_', 'scale_')
+            )
+        )
+    return _shared_scaler
+
+
+def _fill_features(row: np.ndarray, input_data: EmissionPredictionInput) -> None:
+    """Tulis features satu input ke row (urutan FEATURE_COLUMNS)"""
+    row[0] = input_data.speed_mean
+    row[1] = input_data.speed_max
+    row[2] = input_data.speed_std
+    row[3] = input_data.distance_delta_total
+    row[4] = input_data.rpm_mean
+    row[5] = input_data.rpm_max
+    row[6] = input_data.engine_load_mean
+    row[7] = input_data.is_moving_mean
+    row[8] = input_data.is_idle_total
+    row[9] = input_data.hour
+    row[10] = input_data.day_of_week
+    row[11] = input_data.is_weekend
+
+
+def _build_features(inputs: List[EmissionPredictionInput]) -> np.ndarray:
+    """Susun matrix features (N, 12) sesuai urutan FEATURE_COLUMNS"""
+    features = np.empty((len(inputs), len(FEATURE_COLUMNS)), dtype=np.float64)
+    for i, input_data in enumerate(inputs):
+        _fill_features(features[i], input_data)
+    return features
+
+
+def _predict_features(features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Prediksi mentah (N,) CO2 emissions dan CO2 intensity dari matrix features (N, 12)
+
+    Memakai session ONNX jika tersedia (scaler sudah termasuk di graph, hasil identik
+    dengan sklearn), selain itu scaler.transform + model.predict sklearn.
+    """
+    onnx = get_onnx_sessions()
+    if onnx is not None:
+        session_co2_emissions, session_co2_intensity = onnx
+        inputs = {"X": np.ascontiguousarray(features, dtype=np.float64)}
+        return (session_co2_emissions.run(None, inputs)[0].ravel(),
+                session_co2_intensity.run(None, inputs)[0].ravel())
+
+    # Load models dan scalers
+    model_co2_emissions, model_co2_intensity, scaler_co2_emissions, scaler_co2_intensity = _get_models()
+    
+    # Scale features untuk CO2 emissions prediction
+    features_scaled_emissions = scaler_co2_emissions.transform(features)
+    pred_co2_emissions = model_co2_emissions.predict(features_scaled_emissions)
+    
+    # Scale features untuk CO2 intensity prediction (reuse jika scaler identik)
+    if _scalers_shared(scaler_co2_emissions, scaler_co2_intensity):
+        features_scaled_intensity = features_scaled_emissions
+    else:
+        features_scaled_intensity = scaler_co2_intensity.transform(features)
+    pred_co2_intensity = model_co2_intensity.predict(features_scaled_intensity)
+    return pred_co2_emissions, pred_co2_intensity
+
+
+def predict_emission_batch(inputs: List[EmissionPredictionInput],
+                           features: np.ndarray = None) -> List[EmissionPredictionOutput]:
+    """
+    Prediksi emisi CO2 untuk banyak input sekaligus (satu kali inference per model)
     
     Args:
-        input_data: EmissionPredictionInput dengan 12 features
+        inputs: List EmissionPredictionInput dengan 12 features
+        features: Optional matrix (N, 12) yang sudah diisi dari inputs (mis. buffer batcher)
     
     Returns:
-        EmissionPredictionOutput dengan prediksi CO2 emissions dan intensity
+        List EmissionPredictionOutput dengan urutan sama seperti inputs
     """
     try:
-        # Load models dan scalers
-        model_co2_emissions = load_model('model_co2_emissions.pkl')
-        model_co2_intensity = load_model('model_co2_intensity.pkl')
-        scaler_co2_emissions = load_model('scaler_co2_emissions.pkl')
-        scaler_co2_intensity = load_model('scaler_co2_intensity.pkl')
-        
-        # Feature list sesuai urutan saat training
-        feature_cols = [
-            'speed_mean',
-            'speed_max',
-            'speed_std',
-            'distance_delta_total',
-            'rpm_mean',
-            'rpm_max',
-            'engine_load_mean',
-            'is_moving_mean',
-            'is_idle_total',
-            'hour',
-            'day_of_week',
-            'is_weekend'
-        ]
-        
         # Ekstrak features dari input data
-        features = np.array([[
-            input_data.speed_mean,
-            input_data.speed_max,
-            input_data.speed_std,
-            input_data.distance_delta_total,
-            input_data.rpm_mean,
-            input_data.rpm_max,
-            input_data.engine_load_mean,
-            input_data.is_moving_mean,
-            input_data.is_idle_total,
-            input_data.hour,
-            input_data.day_of_week,
-            input_data.is_weekend
-        ]])
-        
-        # Scale features untuk CO2 emissions prediction
-        features_scaled_emissions = scaler_co2_emissions.transform(features)
-        pred_co2_emissions = model_co2_emissions.predict(features_scaled_emissions)[0]
+        if features is None:
+            features = _build_features(inputs)
         
-        # Scale features untuk CO2 intensity prediction
-        features_scaled_intensity = scaler_co2_intensity.transform(features)
-        pred_co2_intensity = model_co2_intensity.predict(features_scaled_intensity)[0]
+        pred_co2_emissions, pred_co2_intensity = _predict_features(features)
         
         # Ensure predictions are non-negative
-        pred_co2_emissions = max(0, pred_co2_emissions)
-        pred_co2_intensity = max(0, pred_co2_intensity)
+        pred_co2_emissions = np.maximum(0, pred_co2_emissions)
+        pred_co2_intensity = np.maximum(0, pred_co2_intensity)
         
-        return EmissionPredictionOutput(
-            co2_emissions_grams=round(pred_co2_emissions, 2),
-            co2_intensity=round(pred_co2_intensity, 2),
-            predictions={
-                "co2_emissions_grams": round(pred_co2_emissions, 2),
-                "co2_intensity": round(pred_co2_intensity, 2),
-                "features_used": dict(zip(feature_cols, features[0].tolist()))
-            }
-        )
+        results = []
+        for i, input_data in enumerate(inputs):
+            co2_emissions_grams = round(float(pred_co2_emissions[i]), 2)
+            co2_intensity = round(float(pred_co2_intensity[i]), 2)
+            results.append(EmissionPredictionOutput(
+                co2_emissions_grams=co2_emissions_grams,
+                co2_intensity=co2_intensity,
+                predictions={
+                    "co2_emissions_grams": co2_emissions_grams,
+                    "co2_intensity": co2_intensity,
+                    "features_used": {col: float(getattr(input_data, col)) for col in FEATURE_COLUMNS}
+                }
+            ))
+        return results
     
     except FileNotFoundError as e:
         raise Exception(f"Model loading error: {str(e)}")
     except Exception as e:
-        raise Exception(f"Prediction error: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Prediction error: {str(e)}")
+
+
+def predict_emission(input_data: EmissionPredictionInput) -> EmissionPredictionOutput:
+    """
+    Prediksi emisi CO2 berdasarkan hourly aggregated features
+    
+    Args:
+        input_data: EmissionPredictionInput dengan 12 features
+    
+    Returns:
+        EmissionPredictionOutput dengan prediksi CO2 emissions dan intensity
+    """
+    return predict_emission_batch([input_data])[0]
+
+
+class EmissionBatcher(AsyncBatcher):
+    """Dynamic batcher untuk endpoint /emission/predict-hourly"""
+
+    n_features = len(FEATURE_COLUMNS)
+    # float64: scaling di float32 menggeser split regressor dan mengubah hasil prediksi
+    feature_dtype = np.float64
+
+    def fill_row(self, row: np.ndarray, item: EmissionPredictionInput) -> None:
+        _fill_features(row, item)
+
+    def process_batch(self, items: List[EmissionPredictionInput], features: np.ndarray) -> List[EmissionPredictionOutput]:
+        return predict_emission_batch(items, features)
+
+
+emission_batcher = EmissionBatcher()
@@ -1,5 +1,5 @@
 import uuid
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from datetime import datetime, timedelta
 from app.schemas.notification import (
     DashboardNotificationInput,
@@ -8,7 +8,8 @@ from app.schemas.notification import (
     NotificationPriority,
     NotificationType,
     AnomalyNotificationInput,
-    AnomalyNotificationOutput
+    AnomalyNotificationOutput,
+    StatusColor
 )
 
 # In-memory notification history (for demo, can be replaced with database)
@@ -158,7 +159,7 @@ def generate_dashboard_notifications(input_data: DashboardNotificationInput) ->
         high_count += 1
     
     # 6. Positive notification - Green status
-    if "🟢" in input_data.status_color and not notifications:
+    if input_data.status_color == StatusColor.GREEN and not notifications:
         notification = NotificationDetail(
             notification_type=NotificationType.SYSTEM_INFO,
             title="✅ EXCELLENT PERFORMANCE",
@@ -287,7 +288,7 @@ def generate_anomaly_notifications(input_data: AnomalyNotificationInput) -> Anom
 
 
 def _generate_notification_summary(
-    critical: int, high: int, medium: int, low: int, status_color: str
+    critical: int, high: int, medium: int, low: int, status_color: StatusColor
 ) -> str:
     """Generate summary text untuk notifikasi"""
     if critical > 0:
@@ -338,7 +339,53 @@ def _save_notification_to_history(device_id: int, notifications: List[Notificati
         _notification_history[device_id].append(record)
 
 
-def get_notification_history(device_id: int, limit: int = 50, days: int = 7) -> Dict[str, Any]:
+def iter_notification_history(
+    device_id: int,
+    limit: int = 50,
+    days: int = 7,
+    notification_type: Optional[str] = None,
+    priority: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Iterasi notification history (terbaru dulu) dengan filter langsung di storage
+    
+    History disimpan append-only dengan timestamp naik, jadi iterasi dari belakang
+    sudah terurut descending dan bisa berhenti di cutoff tanggal atau saat limit tercapai
+    tanpa sort / list perantara.
+    
+    Args:
+        device_id: Device ID
+        limit: Jumlah records maksimum
+        days: Jumlah hari history
+        notification_type: Filter by type (opsional)
+        priority: Filter by priority (opsional)
+    """
+    records = _notification_history.get(device_id)
+    if not records:
+        return
+    
+    cutoff_date = datetime.now() - timedelta(days=days)
+    count = 0
+    for n in reversed(records):
+        if n['timestamp'] < cutoff_date:
+            break
+        if notification_type and n['notification_type'] != notification_type:
+            continue
+        if priority and n['priority'] != priority:
+            continue
+        yield n
+        count += 1
+        if count >= limit:
+            break
+
+
+def get_notification_history(
+    device_id: int,
+    limit: int = 50,
+    days: int = 7,
+    notification_type: Optional[str] = None,
+    priority: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Get notification history untuk device
     
@@ -346,31 +393,16 @@ def get_notification_history(device_id: int, limit: int = 50, days: int = 7) ->
         device_id: Device ID
         limit: Jumlah records yang diambil
         days: Jumlah hari history
+        notification_type: Filter by type (opsional)
+        priority: Filter by priority (opsional)
         
     Returns:
         Dict dengan notification history
     """
-    if device_id not in _notification_history:
-        return {
-            'device_id': device_id,
-            'total_records': 0,
-            'unread_count': 0,
-            'notifications': []
-        }
-    
-    # Filter by date
-    cutoff_date = datetime.now() - timedelta(days=days)
-    
-    history = [
-        n for n in _notification_history[device_id]
-        if n['timestamp'] >= cutoff_date
-    ]
-    
-    # Sort by timestamp descending
-    history = sorted(history, key=lambda x: x['timestamp'], reverse=True)
-    
-    # Apply limit
-    history = history[:limit]
+    history = list(iter_notification_history(
+        device_id, limit=limit, days=days,
+        notification_type=notification_type, priority=priority
+    ))
     
     # Count unread
     unread_count = sum(1 for n in history if n['status'] == 'UNREAD')
@@ -0,0 +1,54 @@
+"""
+Konfigurasi Gunicorn untuk deployment non-serverless (VM / container).
+
+    pip install -r requirements-vm.txt  # requirements.txt + numba
+    gunicorn app.main:app -c gunicorn_config.py
+
+atau tanpa Gunicorn:
+
+    uvicorn app.main:app --loop uvloop --http httptools --workers N
+
+Inference ML CPU-bound dan terikat GIL, jadi paralelisme antar core didapat dari
+beberapa worker process. Dengan preload_app, app beserta modul yang di-import (FastAPI,
+pydantic, numpy, sklearn, onnxruntime) dan pickle kecil (params + scaler) di-load sekali
+di master lalu di-share ke worker via copy-on-write setelah fork. Model tree (Isolation
+Forest, RandomForest emisi) tidak ikut di-share: tiap worker membuat session onnxruntime
+sendiri dari file .onnx (~1-2 MB per worker).
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", max(2, (os.cpu_count() or 1) * 2 + 1)))
+worker_class = "app.core.uvicorn_worker.UvloopWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+# Dibaca app.core.config untuk membagi thread executor ML, batch concurrency dan intra-op
+# threads onnxruntime per worker (cpu_count // workers) agar tidak oversubscription
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+
+def on_starting(server):
+    """Load pickle kecil (params anomaly + scaler) di master sebelum fork supaya tidak di-load per worker"""
+    from app.services import anomaly_service, emission_service
+
+    for filename in ('anomaly_detection_params.pkl', 'scaler_anomaly_detection.pkl'):
+        anomaly_service.load_model(filename)
+    for filename in ('scaler_co2_emissions.pkl', 'scaler_co2_intensity.pkl'):
+        emission_service.load_model(filename)
+    # Isolation Forest dan RandomForest emisi dijalankan lewat ONNX; session onnxruntime
+    # sengaja tidak dibuat di sini: thread pool-nya tidak aman di-fork
+
+
+def when_ready(server):
+    """
+    Bekukan objek hasil preload sebelum worker di-fork.
+
+    Tanpa gc.freeze(), GC di worker menulis header setiap objek yang dibuat master saat
+    koleksi sehingga page copy-on-write ter-copy per worker. Yang terlindungi terutama objek
+    modul dan app yang di-import (~20 MB); pickle yang di-preload hanya beberapa KB.
+    """
+    import gc
+
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, List
+
+import numpy as np
+import pytest
+
+from app.core.batching import AsyncBatcher, QueueFullError
+
+
+class EchoBatcher(AsyncBatcher):
+    """Batcher uji: hasil = feature item itu sendiri; item negatif menggagalkan batch"""
+
+    n_features = 1
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batch_sizes: List[int] = []
+
+    def fill_row(self, row: np.ndarray, item: Any) -> None:
+        row[0] = item
+
+    def process_batch(self, items: List[Any], features: np.ndarray) -> List[Any]:
+        self.batch_sizes.append(len(items))
+        if any(item < 0 for item in items):
+            raise ValueError("negative item")
+        return features[:, 0].tolist()
+
+
+def test_batcher_is_abstract():
+    with pytest.raises(TypeError):
+        AsyncBatcher()
+
+
+def test_results_keep_request_order():
+    batcher = EchoBatcher(max_batch_size=8, max_wait_ms=5, max_queue_size=100)
+
+    async def main():
+        return await asyncio.gather(*(batcher.process(i) for i in range(50)))
+
+    assert asyncio.run(main()) == list(range(50))
+    assert max(batcher.batch_sizes) <= 8
+    # Request yang masuk bersamaan digabung, bukan diproses satu per satu
+    assert len(batcher.batch_sizes) < 50
+    assert sum(batcher.batch_sizes) == 50
+
+
+def test_error_propagates_to_every_request_in_batch():
+    batcher = EchoBatcher(max_batch_size=4, max_wait_ms=50, max_queue_size=100)
+
+    async def main():
+        failed = await asyncio.gather(*(batcher.process(i) for i in (1, -1, 2)), return_exceptions=True)
+        # Batcher tetap bisa dipakai setelah batch gagal
+        return failed, await batcher.process(3)
+
+    failed, after = asyncio.run(main())
+    assert batcher.batch_sizes[0] == 3
+    assert all(isinstance(result, ValueError) for result in failed)
+    assert after == 3
+
+
+def test_queue_full_raises():
+    batcher = EchoBatcher(max_batch_size=4, max_wait_ms=5, max_queue_size=1)
+
+    async def main():
+        return await asyncio.gather(*(batcher.process(i) for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert results[0] == 0
+    assert all(isinstance(result, QueueFullError) for result in results[1:])
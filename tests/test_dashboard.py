@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.api.v1 import dashboard
+from app.services.dashboard_service import IDLE_TIME_CRITICAL_MINS, calculate_dashboard_metrics
+
+NOW = datetime(2026, 10, 15, 12, 30, tzinfo=timezone.utc)
+
+
+def _record(timestamp, status, fuel_level_l=100.0, odometer_km=1000.0):
+    return {"timestamp": timestamp, "status": status, "fuel_level_l": fuel_level_l, "odometer_km": odometer_km}
+
+
+def test_open_idle_period_counts_until_now():
+    history = [
+        _record("2026-10-15 08:00:00", "Drive"),
+        _record("2026-10-15 09:00:00", "Idle"),
+        _record("2026-10-15 09:20:00", "Drive"),
+        _record("2026-10-15 10:00:00", "Idle"),
+    ]
+    metrics = calculate_dashboard_metrics(history, now=NOW)
+
+    # 20 menit idle yang sudah ditutup + 150 menit idle yang masih berjalan (10:00 -> 12:30)
+    assert metrics["details"]["idle_time_minutes"] == 170.0
+    assert 170.0 > IDLE_TIME_CRITICAL_MINS
+    assert metrics["status_color"] == "🔴 Red (Critical)"
+
+
+def test_idle_time_grows_with_now():
+    history = [_record("2026-10-15 12:00:00", "Idle")]
+    earlier = calculate_dashboard_metrics(history, now=NOW)
+    later = calculate_dashboard_metrics(history, now=NOW.replace(minute=59))
+    assert earlier["details"]["idle_time_minutes"] == 30.0
+    assert later["details"]["idle_time_minutes"] == 59.0
+    assert later["status_color"] == "🟡 Yellow (Warning)"
+
+
+def test_naive_now_is_treated_as_utc():
+    history = [_record("2026-10-15 12:00:00", "Idle")]
+    metrics = calculate_dashboard_metrics(history, now=NOW.replace(tzinfo=None))
+    assert metrics["details"]["idle_time_minutes"] == 30.0
+
+
+def test_unsorted_history_with_invalid_timestamp():
+    history = [
+        _record("2026-10-15 10:00:00", "Idle"),
+        _record("2026-10-15 invalid", "Drive"),
+        _record("2026-10-15 09:00:00", "Drive"),
+    ]
+    metrics = calculate_dashboard_metrics(history, now=NOW)
+    assert metrics["details"]["idle_time_minutes"] == 150.0
+
+
+def _history(status):
+    return {"items": [{"status": status, "items": [{"id": 1, "time": "2026-10-15 10:00:00"}]}]}
+
+
+@pytest.mark.parametrize("status, changes", [("Idle", True), ("Drive", False)])
+def test_history_etag_minute_bucket_only_while_idle(monkeypatch, status, changes):
+    monkeypatch.setattr(dashboard.time, "time", lambda: 1_000_000 * 60 + 5)
+    first = dashboard._history_etag(_history(status), 1, "2026-10-15")
+    monkeypatch.setattr(dashboard.time, "time", lambda: 1_000_000 * 60 + 55)
+    assert dashboard._history_etag(_history(status), 1, "2026-10-15") == first
+    monkeypatch.setattr(dashboard.time, "time", lambda: 1_000_001 * 60 + 5)
+    assert (dashboard._history_etag(_history(status), 1, "2026-10-15") != first) == changes
@@ -0,0 +1,26 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Schema di-cache di app; mulai dari state bersih dan kembalikan setelah test
+    monkeypatch.setattr(app, "servers", [])
+    monkeypatch.setattr(app, "openapi_schema", None)
+    monkeypatch.setattr(app.state, "openapi_body", None, raising=False)
+    return TestClient(app, root_path="/api")
+
+
+@pytest.mark.parametrize("path", ["/docs", "/redoc"])
+def test_docs_use_root_path(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert "/api/openapi.json" in response.text
+
+
+def test_openapi_servers_include_root_path(client):
+    response = client.get("/openapi.json")
+    assert response.status_code == 200
+    assert response.json()["servers"] == [{"url": "/api"}]
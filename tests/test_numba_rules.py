@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.services import _numba_rules
+
+pytestmark = pytest.mark.skipif(not _numba_rules.HAS_NUMBA, reason="numba not installed")
+
+FUEL_THEFT_THRESHOLD = -5.0
+CO2_MEAN, CO2_STD = 150.0, 50.0
+
+
+def _rule_inputs(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    speed = np.where(rng.random(n) < 0.3, 0.0, rng.uniform(0, 120, n))
+    distance_delta = np.where(rng.random(n) < 0.3, rng.uniform(0, 0.1, n), rng.uniform(0, 5, n))
+    fuel_delta = rng.uniform(-20, 5, n)
+    co2_intensity = rng.uniform(0, 400, n)
+    return speed, distance_delta, fuel_delta, co2_intensity
+
+
+@pytest.fixture(scope="module", autouse=True)
+def compiled():
+    _numba_rules.warmup()
+
+
+@pytest.mark.parametrize("co2_std", [CO2_STD, 0.0])
+def test_rules_batch_matches_python(co2_std):
+    args = (*_rule_inputs(500), FUEL_THEFT_THRESHOLD, CO2_MEAN, co2_std)
+    compiled = _numba_rules._rules_batch(*args)
+    expected = _numba_rules._rules_batch.py_func(*args)
+    for got, want in zip(compiled, expected):
+        np.testing.assert_array_equal(got, want)
+
+
+def test_rules_batch_matches_scalar_kernels():
+    speed, distance_delta, fuel_delta, co2_intensity = _rule_inputs(200, seed=1)
+    (is_fuel_theft, large_fuel_drop, vehicle_stationary, no_movement, risk_score,
+     is_inefficient, threshold, deviation) = _numba_rules._rules_batch(
+        speed, distance_delta, fuel_delta, co2_intensity, FUEL_THEFT_THRESHOLD, CO2_MEAN, CO2_STD
+    )
+    for i in range(len(speed)):
+        assert _numba_rules._fuel_theft(speed[i], distance_delta[i], fuel_delta[i], FUEL_THEFT_THRESHOLD) == (
+            is_fuel_theft[i], large_fuel_drop[i], vehicle_stationary[i], no_movement[i], risk_score[i]
+        )
+        scalar = _numba_rules._emission_inefficiency(co2_intensity[i], CO2_MEAN, CO2_STD)
+        assert scalar[:3] == (is_inefficient[i], threshold, deviation[i])
+
+
+def test_scalar_kernels_match_python():
+    for args in [(0.0, 0.0, -10.0, -5.0), (30.0, 1.0, -1.0, -5.0), (0.0, 0.05, -6.0, -5.0)]:
+        assert _numba_rules._fuel_theft(*args) == _numba_rules._fuel_theft.py_func(*args)
+    for args in [(180.0, 120.0), (60.0, 120.0)]:
+        assert _numba_rules._excessive_idle(*args) == _numba_rules._excessive_idle.py_func(*args)
+    for deviation in [-40.0, -2.0, 0.0, 1.5, 8.0]:
+        assert _numba_rules._normal_percentile(deviation) == pytest.approx(
+            _numba_rules._normal_percentile.py_func(deviation), rel=1e-12
+        )
+
+
+def test_accumulate_deltas_matches_python():
+    rng = np.random.default_rng(2)
+    fuel_level = np.cumsum(rng.uniform(-3, 2, 1000)) + 200
+    odometer = np.cumsum(rng.uniform(-1, 5, 1000))
+    got = _numba_rules._accumulate_deltas(fuel_level, odometer)
+    want = _numba_rules._accumulate_deltas.py_func(fuel_level, odometer)
+    assert got == pytest.approx(want, rel=1e-12)
+    assert _numba_rules._accumulate_deltas(fuel_level[:1], odometer[:1]) == (0.0, 0.0)
+
+
+def test_kernels_from_concurrent_threads():
+    # Kernel dipanggil dari beberapa thread executor ML sekaligus
+    args = (*_rule_inputs(64, seed=3), FUEL_THEFT_THRESHOLD, CO2_MEAN, CO2_STD)
+    expected = _numba_rules._rules_batch.py_func(*args)
+
+    def run(_):
+        return _numba_rules._rules_batch(*args)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for result in pool.map(run, range(200)):
+            np.testing.assert_array_equal(result[0], expected[0])
+            np.testing.assert_array_equal(result[7], expected[7])
@@ -0,0 +1,142 @@
+"""
+Hasil prediksi harus sama dengan implementasi awal (per-request sklearn).
+
+tests/data/*_baseline.json berisi input dan output predict_anomaly / predict_emission
+yang dijalankan pada commit baseline 54b552b (sklearn 1.9, model pickle di app/models).
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.schemas.anomaly import AnomalyDetectionInput
+from app.schemas.emission import EmissionPredictionInput
+from app.services import anomaly_service, emission_service
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+# Isolation Forest ONNX menghitung dalam float32: score mentah (details.ml_anomaly) bergeser
+# < 1e-6, nilai yang di-round (anomaly_score 4 desimal) dan label tetap sama
+SCORE_ABS_TOLERANCE = 1e-6
+
+
+def _load(filename):
+    with open(os.path.join(DATA_DIR, filename)) as f:
+        return json.load(f)
+
+
+def _assert_close(actual, expected, path="output"):
+    """Bandingkan output JSON secara rekursif; float dengan toleransi, selain itu harus identik"""
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys(), path
+        for key in expected:
+            _assert_close(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            _assert_close(a, e, f"{path}[{i}]")
+    elif isinstance(expected, float) and not isinstance(actual, bool):
+        assert actual == pytest.approx(expected, rel=1e-9, abs=SCORE_ABS_TOLERANCE), path
+    else:
+        assert actual == expected, path
+
+
+@pytest.fixture(params=["onnx", "sklearn"])
+def backend(request, monkeypatch):
+    """Jalankan test dengan session ONNX (default) dan fallback sklearn"""
+    if request.param == "onnx":
+        if anomaly_service.get_onnx_session() is None or emission_service.get_onnx_sessions() is None:
+            pytest.skip("onnxruntime or ONNX model files not available")
+    else:
+        # False = sudah dicoba dan tidak tersedia -> pakai sklearn
+        monkeypatch.setattr(anomaly_service, "_onnx_session", False)
+        monkeypatch.setattr(emission_service, "_onnx_sessions", False)
+    return request.param
+
+
+@pytest.fixture(scope="module")
+def anomaly_cases():
+    cases = _load("anomaly_baseline.json")
+    return [AnomalyDetectionInput(**case["input"]) for case in cases], [case["output"] for case in cases]
+
+
+@pytest.fixture(scope="module")
+def emission_cases():
+    cases = _load("emission_baseline.json")
+    return [EmissionPredictionInput(**case["input"]) for case in cases], [case["output"] for case in cases]
+
+
+def test_anomaly_batch_matches_baseline(backend, anomaly_cases):
+    inputs, expected = anomaly_cases
+    outputs = anomaly_service.predict_anomaly_batch(inputs)
+    assert len(outputs) == len(expected)
+    for i, (output, want) in enumerate(zip(outputs, expected)):
+        _assert_close(output.model_dump(mode="json"), want, f"anomaly[{i}]")
+
+
+def test_anomaly_single_matches_batch(backend, anomaly_cases):
+    inputs, _ = anomaly_cases
+    batch = anomaly_service.predict_anomaly_batch(inputs)
+    for input_data, output in zip(inputs, batch):
+        assert anomaly_service.predict_anomaly(input_data) == output
+
+
+def test_emission_batch_matches_baseline(backend, emission_cases):
+    inputs, expected = emission_cases
+    outputs = emission_service.predict_emission_batch(inputs)
+    assert [output.model_dump(mode="json") for output in outputs] == expected
+
+
+def test_emission_single_matches_batch(backend, emission_cases):
+    inputs, _ = emission_cases
+    batch = emission_service.predict_emission_batch(inputs)
+    for input_data, output in zip(inputs, batch):
+        assert emission_service.predict_emission(input_data) == output
+
+
+def _random_features(scaler, n, seed):
+    rng = np.random.default_rng(seed)
+    return scaler.mean_ + scaler.scale_ * rng.standard_normal((n, len(scaler.mean_)))
+
+
+def test_isolation_forest_onnx_matches_sklearn():
+    onnx = anomaly_service.get_onnx_session()
+    if onnx is None:
+        pytest.skip("onnxruntime or ONNX model file not available")
+    session, offset = onnx
+    model = anomaly_service.load_model("model_isolation_forest.pkl")
+    scaler = anomaly_service.load_model("scaler_anomaly_detection.pkl")
+    features = _random_features(scaler, 2000, seed=0)
+
+    labels, scores = session.run(None, {"X": features.astype(np.float32)})
+    scaled = scaler.transform(features)
+    np.testing.assert_allclose(scores.ravel() + offset, model.score_samples(scaled), atol=SCORE_ABS_TOLERANCE)
+    np.testing.assert_array_equal(labels.ravel(), model.predict(scaled))
+
+
+def test_isolation_forest_fused_scaler_matches_sklearn():
+    # Fallback sklearn memakai threshold tree yang sudah dilebur dengan scaler
+    model = anomaly_service.load_model("model_isolation_forest.pkl")
+    scaler = anomaly_service.load_model("scaler_anomaly_detection.pkl")
+    features = _random_features(scaler, 2000, seed=1)
+
+    fused = anomaly_service._get_iforest_model()
+    np.testing.assert_allclose(fused.score_samples(features), model.score_samples(scaler.transform(features)),
+                               rtol=1e-12)
+
+
+def test_emission_onnx_matches_sklearn():
+    sessions = emission_service.get_onnx_sessions()
+    if sessions is None:
+        pytest.skip("onnxruntime or ONNX model files not available")
+    model_co2_emissions, model_co2_intensity, scaler_co2_emissions, scaler_co2_intensity = (
+        emission_service._get_models()
+    )
+    features = np.abs(_random_features(scaler_co2_emissions, 2000, seed=2))
+
+    pred_co2_emissions, pred_co2_intensity = emission_service._predict_features(features)
+    np.testing.assert_array_equal(pred_co2_emissions,
+                                  model_co2_emissions.predict(scaler_co2_emissions.transform(features)))
+    np.testing.assert_array_equal(pred_co2_intensity,
+                                  model_co2_intensity.predict(scaler_co2_intensity.transform(features)))
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+def test_followers_share_leader_result():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", fetch, i) for i in range(5)))
+
+    assert asyncio.run(main()) == [0] * 5
+    assert calls == [0]
+
+
+def test_followers_share_leader_exception():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream error")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(main()))
+
+
+def test_follower_retries_when_leader_cancelled():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", fetch, "leader"))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do("key", fetch, f"follower{i}")) for i in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    # Follower pertama menjadi leader baru, sisanya menunggu hasilnya
+    assert asyncio.run(main()) == ["follower0"] * 3
+    assert calls == ["leader", "follower0"]
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0.005)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == "ok"
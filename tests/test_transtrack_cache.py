@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.config import TRANSTRACK_CACHE_TTL_LIVE, TRANSTRACK_CACHE_TTL_PAST
+from app.services import transtrack_service
+
+
+def _freeze_utc(monkeypatch, frozen: datetime):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return frozen.astimezone(tz) if tz is not None else frozen.replace(tzinfo=None)
+
+    monkeypatch.setattr(transtrack_service, "datetime", FrozenDatetime)
+
+
+@pytest.mark.parametrize("frozen", [
+    # 01:30 di host UTC+7 (WIB): tanggal lokal sudah 2026-10-16, hari UTC masih 2026-10-15
+    datetime(2026, 10, 15, 18, 30, tzinfo=timezone.utc),
+    datetime(2026, 10, 15, 0, 0, tzinfo=timezone.utc),
+    datetime(2026, 10, 15, 23, 59, 59, tzinfo=timezone.utc),
+])
+def test_current_utc_day_is_not_past(monkeypatch, frozen):
+    _freeze_utc(monkeypatch, frozen)
+    assert not transtrack_service.is_past_range("2026-10-15")
+    assert transtrack_service.history_cache_ttl("2026-10-15") == TRANSTRACK_CACHE_TTL_LIVE
+    assert transtrack_service.is_past_range("2026-10-14")
+    assert transtrack_service.history_cache_ttl("2026-10-14") == TRANSTRACK_CACHE_TTL_PAST
+
+
+def test_missing_to_date_is_not_past():
+    assert not transtrack_service.is_past_range(None)
+    assert not transtrack_service.is_past_range("")